@@ -1,19 +1,26 @@
 import re, pathlib
-import typer, yaml
+import typer
 from slugify import slugify
 from loguru import logger
+from _cfg import load_cfg
 
 app = typer.Typer()
-def load_cfg():
-    with open("config.yaml","r") as f: return yaml.safe_load(f)
+
+# Runs of horizontal whitespace (newlines kept)
+_WS_RE = re.compile(r'[^\S\r\n]+')
+# Line endings: CRLF and lone CR (old Mac / stray) become LF, as splitlines() treated them
+_NL_RE = re.compile(r'\r\n?')
+# Leading/trailing space on each line
+_EDGE_RE = re.compile(r'(?m)^ | $')
+# Blank lines
+_BLANK_RE = re.compile(r'\n{2,}')
 
 @app.command()
 def run(input_path: str):
     cfg = load_cfg()
     text = pathlib.Path(input_path).read_text(encoding="utf-8")
-    text = re.sub(r'[^\S\r\n]+',' ', text).strip()
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    clean = "\n".join(lines)
+    text = _EDGE_RE.sub('', _WS_RE.sub(' ', _NL_RE.sub('\n', text)))
+    clean = _BLANK_RE.sub('\n', text).strip()
     slug = slugify(pathlib.Path(input_path).stem)[:80]
     outdir = pathlib.Path(cfg["paths"]["work_dir"]) / slug
     outdir.mkdir(parents=True, exist_ok=True)
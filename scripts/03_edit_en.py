@@ -1,9 +1,11 @@
-import pathlib, re, typer, yaml
+import pathlib, re, typer
 from loguru import logger
+from _cfg import load_cfg
 
 app = typer.Typer()
-def load_cfg():
-    with open("config.yaml","r") as f: return yaml.safe_load(f)
+
+# Whitespace left before a period by translation
+_SP_DOT_RE = re.compile(r'\s+\.')
 
 @app.command()
 def run(slug: str):
@@ -12,7 +14,7 @@ def run(slug: str):
     text = (wd/"draft_en.txt").read_text(encoding="utf-8")
     first_line = text.splitlines()[0][:90] if text.strip() else "Untitled"
     title = f'{cfg["seo"]["title_prefix"]}{first_line}'.strip()
-    body = re.sub(r'\s+\.', '.', text).strip()
+    body = _SP_DOT_RE.sub('.', text).strip()
     tags = ", ".join(cfg["seo"]["tags"])
     md = f"# {title}\n\n{body}\n\n---\n**Tags:** {tags}\n"
     (wd/"post_en.md").write_text(md, encoding="utf-8")
@@ -1,12 +1,18 @@
-import pathlib, subprocess, typer, yaml, os
+import pathlib, subprocess, typer, os, re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import List
 from loguru import logger
+from _cfg import load_cfg
+from piper_session import open_piper, onnx_available
 
 app = typer.Typer()
-def load_cfg():
-    with open("config.yaml","r") as f: return yaml.safe_load(f)
 
-def piper_tts(text, output_file, cfg):
-    """Generate TTS using piper binary"""
+# Markdown headings and the **Tags:** line are not read aloud
+_HDR_RE = re.compile(r'(?m)^(#.*|\*\*Tags:\*\*.*)\n?')
+
+def piper_paths(cfg):
+    """Resolve and validate the piper binary and voice model"""
     # Get piper settings from config or environment
     piper_exec = os.getenv("PIPER_EXEC", "piper")
     piper_model = os.getenv("PIPER_MODEL", f"{os.path.expanduser('~')}/piper_models/en_US-amy-medium.onnx")
@@ -20,9 +26,9 @@ def piper_tts(text, output_file, cfg):
     piper_exec = os.path.expandvars(os.path.expanduser(piper_exec))
     piper_model = os.path.expandvars(os.path.expanduser(piper_model))
     
-    # Check if piper binary exists
+    # Check if piper binary exists (not needed when the voice runs in-process via onnxruntime)
     piper_check = subprocess.run(["which", piper_exec], capture_output=True, text=True)
-    if piper_check.returncode != 0:
+    if piper_check.returncode != 0 and not onnx_available(piper_model):
         logger.error(f"❌ Piper executable not found: {piper_exec}")
         logger.error("   Fix: brew install piper")
         logger.error("   Or download from: https://github.com/rhasspy/piper/releases")
@@ -36,49 +42,72 @@ def piper_tts(text, output_file, cfg):
         logger.error(f"   Example: wget https://huggingface.co/rhasspy/piper-voices/resolve/main/en/en_US/amy/medium/en_US-amy-medium.onnx -P ~/piper_models/")
         logger.error(f"   Then set PIPER_MODEL={piper_model} in .env")
         raise SystemExit(1)
-    
-    # Run piper TTS
+
+    return piper_exec, piper_model
+
+def piper_tts(text, output_file, session):
+    """Generate TTS on an already-running piper session (model stays loaded)"""
     try:
-        # Save text to temporary file (piper works better with file input)
-        temp_txt = pathlib.Path(output_file).parent / "temp_tts.txt"
-        temp_txt.write_text(text, encoding="utf-8")
-        
-        cmd = [piper_exec, "--model", piper_model, "--output_file", str(output_file)]
-        
-        with open(temp_txt, 'r') as stdin_file:
-            result = subprocess.run(cmd, stdin=stdin_file, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            logger.error(f"❌ Piper TTS failed: {result.stderr}")
-            raise SystemExit(1)
-        
-        # Clean up temp file
-        temp_txt.unlink(missing_ok=True)
-        
+        session.synthesize_to(text, output_file)
         logger.info(f"✓ Generated TTS audio with Piper: {output_file}")
-        
     except Exception as e:
         logger.error(f"❌ TTS generation failed: {e}")
         raise SystemExit(1)
 
-@app.command()
-def run(slug: str):
-    cfg = load_cfg()
+def prepare_tts_text(slug, cfg):
+    """Strip headings/tags from post_en.md and write tts_en.txt; returns the body"""
     wd = pathlib.Path(cfg["paths"]["work_dir"]) / slug
+    text = (wd/"post_en.md").read_text(encoding="utf-8")
+    body = _HDR_RE.sub('', text).strip()
+    (wd/"tts_en.txt").write_text(body, encoding="utf-8")
+    return body
+
+# Per-worker state for parallel multi-slug runs (each worker loads the voice once)
+_WORKER = {}
+
+def _init_worker(cfg, piper_exec, piper_model, threads):
+    # Keep each worker's math libraries from oversubscribing the cores
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    session = open_piper(piper_model, piper_exec, threads=threads)
+    # Pool workers skip atexit; Finalize runs when the worker shuts down
+    Finalize(session, session.close, exitpriority=10)
+    _WORKER.update(cfg=cfg, session=session)
+
+def _synthesize_slug(slug):
+    return synthesize_slug(slug, _WORKER["cfg"], _WORKER["session"])
+
+def synthesize_slug(slug, cfg, session):
+    """post_en.md -> output/<slug>/voice_en.wav on the given session"""
     outdir = pathlib.Path(cfg["paths"]["output_dir"]) / slug
     outdir.mkdir(parents=True, exist_ok=True)
 
-    text = (wd/"post_en.md").read_text(encoding="utf-8")
-    body = "\n".join([l for l in text.splitlines() if not l.startswith("#") and not l.startswith("**Tags:**")])
-    tts_txt = wd/"tts_en.txt"
-    tts_txt.write_text(body, encoding="utf-8")
+    body = prepare_tts_text(slug, cfg)
+    wav = outdir/"voice_en.wav"
+    piper_tts(body, wav, session)
+    return wav
 
+@app.command()
+def run(slugs: List[str],
+        workers: int = typer.Option(0, help="Parallel piper sessions for multiple slugs (0 = cores // 2)")):
+    """Synthesize voice_en.wav for one or more slugs; several slugs fan out over worker sessions"""
+    cfg = load_cfg()
     if cfg["tts"]["engine"] != "piper":
         raise SystemExit("현재 스크립트는 piper 전용입니다.")
 
-    wav = outdir/"voice_en.wav"
-    piper_tts(body, wav, cfg)
-    logger.success(f"TTS -> {wav}")
+    piper_exec, piper_model = piper_paths(cfg)
+    workers = min(len(slugs), workers or max(1, (os.cpu_count() or 2) // 2))
+
+    if workers <= 1:
+        with open_piper(piper_model, piper_exec) as session:
+            for slug in slugs:
+                logger.success(f"TTS -> {synthesize_slug(slug, cfg, session)}")
+        return
+
+    logger.info(f"Synthesizing {len(slugs)} slugs on {workers} piper sessions")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cfg, piper_exec, piper_model, 2)) as pool:
+        for wav in pool.map(_synthesize_slug, slugs):
+            logger.success(f"TTS -> {wav}")
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
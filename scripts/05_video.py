@@ -1,9 +1,56 @@
-import pathlib, subprocess, typer, yaml
+import functools, pathlib, platform, subprocess, typer
 from loguru import logger
+from _cfg import load_cfg
 
 app = typer.Typer()
-def load_cfg():
-    with open("config.yaml","r") as f: return yaml.safe_load(f)
+
+def background_input(cfg):
+    """ffmpeg input args for the background: video.bg_image if set, else a lavfi color source"""
+    bg = cfg["video"].get("bg_image")
+    if bg and pathlib.Path(bg).exists():
+        return ["-loop", "1", "-i", str(bg)]
+    color = cfg["video"].get("background_color", "black")
+    return ["-f", "lavfi", "-i", f'color=c={color}:s={cfg["video"]["width"]}x{cfg["video"]["height"]}:r={cfg["video"]["fps"]}']
+
+def _escape(s, special):
+    return "".join("\\" + c if c in special else c for c in s)
+
+def drawtext_value(text):
+    """Escape text for drawtext's option parser, then for the filtergraph parser (no shell involved)"""
+    return _escape(_escape(text, "\\':"), "\\'[],;")
+
+SW_ENCODER = ("-c:v", "libx264", "-preset", "ultrafast")
+
+@functools.lru_cache(maxsize=None)
+def video_encoder(preference="auto"):
+    """-c:v args: a hardware H.264 encoder when this ffmpeg build has one, libx264 otherwise"""
+    if preference == "libx264":
+        return SW_ENCODER
+    if preference != "auto":
+        return ("-c:v", preference, "-b:v", "2M")
+
+    try:
+        encoders = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                  capture_output=True, text=True).stdout
+    except OSError:
+        return SW_ENCODER
+
+    system = platform.system()
+    # Hardware encoders ignore -crf; give them a bitrate instead
+    if system == "Darwin" and "h264_videotoolbox" in encoders:
+        return ("-c:v", "h264_videotoolbox", "-b:v", "2M")
+    if system == "Linux" and "h264_nvenc" in encoders:
+        return ("-c:v", "h264_nvenc", "-b:v", "2M")
+    return SW_ENCODER
+
+def encode(bg_in, wav, mp4, filter_expr, out_label, fps, vcodec=SW_ENCODER):
+    """Run one ffmpeg encode as an argv list; progress goes straight to the terminal"""
+    cmd = ["ffmpeg", *bg_in, "-i", str(wav),
+           "-filter_complex", filter_expr,
+           "-map", out_label, "-map", "1:a",
+           *vcodec, "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest",
+           "-r", str(fps), str(mp4), "-y"]
+    subprocess.run(cmd, check=True)
 
 @app.command()
 def run(slug: str, title_text: str = ""):
@@ -11,39 +58,36 @@ def run(slug: str, title_text: str = ""):
     outdir = pathlib.Path(cfg["paths"]["output_dir"]) / slug
     outdir.mkdir(parents=True, exist_ok=True)
     wav = outdir/"voice_en.wav"
-    bg = pathlib.Path(cfg["video"]["bg_image"])
     mp4 = outdir/"video_en.mp4"
+    w, h, fps = cfg["video"]["width"], cfg["video"]["height"], cfg["video"]["fps"]
 
-    if not bg.exists():
-        black = outdir/"black.png"
-        subprocess.run(
-            f'ffmpeg -f lavfi -i color=c=black:s={cfg["video"]["width"]}x{cfg["video"]["height"]}:d=5 '
-            f'-frames:v 1 "{black}" -y', shell=True, check=True)
-        bg = black
-
-    # Escape special characters in title text for ffmpeg
-    safe_title = title_text[:60].replace("'", "\\'").replace(":", "-").replace('"', '\\"')
-    
-    drawtxt = f"drawtext=text='{safe_title}':fontcolor=white:fontsize=48:x=(w-tw)/2:y=60"
-    cmd = f'''
-ffmpeg -loop 1 -i "{bg}" -i "{wav}" \
- -filter_complex "[1:a]showwaves=s={cfg["video"]["width"]}x200:mode=line:rate=25,format=rgba[w]; \
- [0:v][w]overlay=0:{cfg["video"]["height"]-220}[v1]; [v1]{drawtxt}[v2]" \
- -map "[v2]" -map 1:a -c:v h264 -pix_fmt yuv420p -c:a aac -shortest -r {cfg["video"]["fps"]} "{mp4}" -y
-'''
-    try:
-        subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-        logger.success(f"Video -> {mp4}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg error: {e.stderr}")
-        # Create a simple video without waveform as fallback
-        fallback_cmd = f'''
-ffmpeg -loop 1 -i "{bg}" -i "{wav}" \
- -filter_complex "[0:v]{drawtxt}[v]" \
- -map "[v]" -map 1:a -c:v h264 -pix_fmt yuv420p -c:a aac -shortest -r {cfg["video"]["fps"]} "{mp4}" -y
-'''
-        subprocess.run(fallback_cmd, shell=True, check=True)
-        logger.success(f"Video (fallback) -> {mp4}")
+    # Background is generated inside the encode itself; no intermediate PNG
+    bg_in = background_input(cfg)
+
+    drawtxt = (f"drawtext=text={drawtext_value(title_text[:60])}:expansion=none"
+               f":fontcolor=white:fontsize=48:x=(w-tw)/2:y=60")
+    waves = (f"[1:a]showwaves=s={w}x200:mode=line:rate=25,format=rgba[w];"
+             f"[0:v][w]overlay=0:{h-220}[v1];[v1]{drawtxt}[v2]")
+    vcodec = video_encoder(cfg["video"].get("encoder", "auto"))
+    logger.info(f"Encoder: {vcodec[1]}")
+
+    # Waveform on the chosen encoder, then on libx264 (hardware encoder may be listed but unusable),
+    # then a simple video without waveform as the last fallback
+    attempts = [(waves, "[v2]", vcodec)]
+    if vcodec != SW_ENCODER:
+        attempts.append((waves, "[v2]", SW_ENCODER))
+    attempts.append((f"[0:v]{drawtxt}[v]", "[v]", SW_ENCODER))
+
+    for i, (graph, label, codec) in enumerate(attempts):
+        try:
+            encode(bg_in, wav, mp4, graph, label, fps, codec)
+        except subprocess.CalledProcessError as e:
+            if i == len(attempts) - 1:
+                raise
+            logger.error(f"FFmpeg error (exit {e.returncode}), retrying ({i + 2}/{len(attempts)})")
+            continue
+        logger.success(f"Video{'' if label == '[v2]' else ' (fallback)'} -> {mp4}")
+        break
 
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
@@ -1,49 +1,120 @@
-import pathlib, requests, typer, yaml
+import pathlib, requests, typer
+from typing import List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from loguru import logger
+from _cfg import load_cfg, publish_target
 
 app = typer.Typer()
-def load_cfg():
-    with open("config.yaml","r") as f: return yaml.safe_load(f)
+
+# One pooled session: the TLS handshake is paid once for all posts.
+# urllib3's default allowed_methods (idempotent only) keeps the draft POST from being
+# resent after a 5xx/read timeout, when WordPress may already have created it;
+# connection errors (request never sent) are still retried for every method.
+_session = requests.Session()
+_retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+_session.mount("https://", HTTPAdapter(max_retries=_retry))
+_session.mount("http://", HTTPAdapter(max_retries=_retry))
 
 @app.command()
-def wordpress(slug: str):
+def wordpress(slugs: List[str]):
     cfg = load_cfg()
-    wp = cfg["publish"]["wordpress"]
-    if not wp["enabled"]:
+    wp = publish_target(cfg, "wordpress")
+    if wp is None:
         raise SystemExit("WordPress publish disabled in config.yaml")
 
-    wd = pathlib.Path(cfg["paths"]["work_dir"]) / slug
-    post_md = (wd/"post_en.md").read_text(encoding="utf-8")
-    title = post_md.splitlines()[0].lstrip("# ").strip()
+    for slug in slugs:
+        wd = pathlib.Path(cfg["paths"]["work_dir"]) / slug
+        post_md = (wd/"post_en.md").read_text(encoding="utf-8")
+        title = post_md.splitlines()[0].lstrip("# ").strip()
+
+        r = _session.post(
+            f"{wp['base_url'].rstrip('/')}/posts",
+            auth=(wp["username"], wp["app_password"]),
+            json={"title": title, "status": "draft", "content": post_md, "categories": wp["category_ids"]},
+            timeout=30
+        )
+        r.raise_for_status()
+        logger.success(f"WP Draft URL: {r.json().get('link')}")
+
+# OAuth token for the YouTube Data API, refreshed in place after the first browser consent
+YT_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+YT_TOKEN = pathlib.Path.home() / ".config" / "yt-auto" / "token.json"
+YT_CHUNK = 4 * 1024 * 1024   # Resumable upload chunk: memory stays O(chunk), not O(file)
+
+def youtube_credentials(client_secrets):
+    """Cached OAuth credentials; runs the installed-app flow only when there is no usable token"""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    creds = None
+    if YT_TOKEN.exists():
+        creds = Credentials.from_authorized_user_file(str(YT_TOKEN), YT_SCOPES)
+    if creds and creds.valid:
+        return creds
 
-    r = requests.post(
-        f"{wp['base_url'].rstrip('/')}/posts",
-        auth=(wp["username"], wp["app_password"]),
-        json={"title": title, "status": "draft", "content": post_md, "categories": wp["category_ids"]},
-        timeout=30
-    )
-    r.raise_for_status()
-    logger.success(f"WP Draft URL: {r.json().get('link')}")
+    if creds and creds.expired and creds.refresh_token:
+        creds.refresh(Request())
+    else:
+        flow = InstalledAppFlow.from_client_secrets_file(client_secrets, YT_SCOPES)
+        creds = flow.run_local_server(port=0)
+    YT_TOKEN.parent.mkdir(parents=True, exist_ok=True)
+    YT_TOKEN.write_text(creds.to_json(), encoding="utf-8")
+    return creds
 
 @app.command()
 def youtube(slug: str):
     cfg = load_cfg()
-    yt = cfg["publish"]["youtube"]
-    if not yt["enabled"]:
+    yt = publish_target(cfg, "youtube")
+    if yt is None:
         raise SystemExit("YouTube publish disabled in config.yaml")
-    
+
+    try:
+        from googleapiclient.discovery import build
+        from googleapiclient.http import MediaFileUpload
+    except ImportError:
+        logger.error("❌ YouTube upload needs the Google API client")
+        logger.error("   Fix: pip install google-api-python-client google-auth-oauthlib")
+        raise SystemExit(1)
+
     wd = pathlib.Path(cfg["paths"]["work_dir"]) / slug
     outdir = pathlib.Path(cfg["paths"]["output_dir"]) / slug
     
     post_md = (wd/"post_en.md").read_text(encoding="utf-8")
     title = post_md.splitlines()[0].lstrip("# ").strip()
+    description = "\n".join(l for l in post_md.splitlines()[1:] if not l.startswith("**Tags:**")).strip()
     
     video_file = outdir / "video_en.mp4"
-    
-    logger.info(f"YouTube upload would upload: {video_file}")
-    logger.info(f"Title: {title}")
-    logger.info(f"Privacy: {yt['default_privacy']}")
-    logger.warning("YouTube upload not implemented yet - would require OAuth setup")
+    if not video_file.exists():
+        logger.error(f"❌ Video not found: {video_file}")
+        logger.error(f"   Fix: python scripts/05_video.py {slug}")
+        raise SystemExit(1)
+
+    service = build("youtube", "v3",
+                    credentials=youtube_credentials(yt.get("client_secrets", "client_secret.json")),
+                    cache_discovery=False)
+    body = {
+        "snippet": {
+            "title": title[:100],
+            "description": description[:5000],
+            "tags": cfg["seo"]["tags"],
+            "categoryId": str(yt.get("category_id", 22)),
+        },
+        "status": {"privacyStatus": yt["default_privacy"]},
+    }
+
+    # Resumable upload streams the file in chunks and resumes after network blips
+    media = MediaFileUpload(str(video_file), mimetype="video/mp4", chunksize=YT_CHUNK, resumable=True)
+    request = service.videos().insert(part="snippet,status", body=body, media_body=media)
+
+    logger.info(f"Uploading {video_file} ({yt['default_privacy']})")
+    response = None
+    while response is None:
+        status, response = request.next_chunk()
+        if status:
+            logger.info(f"   {int(status.progress() * 100)}%")
+    logger.success(f"YouTube URL: https://youtu.be/{response['id']}")
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Shared config loader for the numbered pipeline scripts (01_prepare ... 06_publish)
+Parsed YAML is memoized per (path, mtime) in-process, and pickled to disk so each
+new stage process skips the parse too
+"""
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+import yaml
+from loguru import logger
+
+# libyaml C parser when PyYAML was built against it, pure-Python otherwise
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Parsed YAML pickles, keyed by source path + mtime/size
+YAML_CACHE_DIR = Path.home() / ".cache" / "yt-auto" / "yaml"
+
+# abspath -> ((mtime_ns, size), parsed dict)
+_CACHE = {}
+
+
+def cached_yaml(path):
+    """Parse a YAML file, reusing a pickled copy while the file is unchanged"""
+    path = Path(path)
+    st = path.stat()
+    tag = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:16]
+    prefix = f"{path.name}.{tag}"
+    cache = YAML_CACHE_DIR / f"{prefix}.{st.st_mtime_ns}.{st.st_size}.pkl"
+    if cache.exists():
+        # Truncated/incompatible pickles raise anything from EOFError to ImportError:
+        # fall through to a fresh parse, which also rewrites the cache file
+        try:
+            return pickle.loads(cache.read_bytes())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable YAML cache {cache.name}: {e!r}; re-parsing {path.name}")
+
+    # One contiguous buffer for the parser instead of a stream reader
+    data = yaml.load(path.read_bytes(), Loader=SafeLoader) or {}
+
+    # Best effort: a read-only home just means no cache
+    try:
+        YAML_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for stale in YAML_CACHE_DIR.glob(f"{prefix}.*.pkl"):
+            stale.unlink(missing_ok=True)
+        tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp, cache)
+    except OSError:
+        pass
+    return data
+
+
+def load_cfg(path="config.yaml"):
+    """Load config.yaml, re-parsing only when the file changed on disk"""
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _CACHE.get(key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+
+    cfg = cached_yaml(path)
+    _CACHE[key] = (stamp, cfg)
+    return cfg
+
+
+def publish_target(cfg, name):
+    """
+    Settings for one publish target ("wordpress", "youtube"), or None when it is off
+
+    Only the dict form (enabled: true/false + settings) is supported. The old bare
+    boolean form carries no settings to publish with, so it is treated as off and,
+    when true, warned about.
+    """
+    target = (cfg.get("publish") or {}).get(name)
+    if isinstance(target, dict):
+        return target if target.get("enabled", False) else None
+    if target:
+        logger.warning(f"publish.{name} in config.yaml must be a mapping with 'enabled' "
+                       f"and its settings (got {target!r}) - treating it as disabled")
+    return None
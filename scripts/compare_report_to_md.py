@@ -3,12 +3,19 @@
 Compare Report to Markdown/CSV - Aggregate comparison reports
 Converts multiple compare_report.json files to CSV and Markdown tables
 """
-import json
+import os
 import csv
+import json
+import math
+import pickle
 import argparse
 import pathlib
 import datetime as dt
 from glob import glob
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 
 FIELDS = [
     "slug", "pause_profile", "fade_ms", "crossfade_ms", "max_chars",
@@ -17,6 +24,18 @@ FIELDS = [
     "piper_skipped"
 ]
 
+# dict row -> tuple in FIELDS order (rows are kept as flat tuples after extraction)
+_as_tuple = itemgetter(*FIELDS)
+
+# Markdown table row template, one "{}" cell per field
+_MD_ROW = "| " + " | ".join(["{}"] * len(FIELDS)) + " |"
+
+# Level written for a silent track (tts_common.DBFS_FLOOR; not imported to keep this script free of pydub)
+DBFS_FLOOR = -120.0
+
+# Parsed-row cache kept next to the outputs: {path: ((mtime_ns, size), row)}
+CACHE_NAME = ".cache.pkl"
+
 
 def g(d, *ks, default=None):
     """Safe nested dict getter"""
@@ -28,6 +47,27 @@ def g(d, *ks, default=None):
     return cur
 
 
+def parse_report(data: bytes) -> dict:
+    """
+    Parse one compare_report.json
+
+    Reports from before dump_metrics() may hold -Infinity (json.dump; orjson rejects it)
+    or null (orjson) for the levels of a silent track; both are read back as DBFS_FLOOR.
+    """
+    try:
+        j = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        j = json.loads(data)
+    for engine in ("openai", "piper"):
+        m = j.get(engine)
+        if not isinstance(m, dict):
+            continue
+        for key in ("rms_dbfs", "peak_dbfs"):
+            if key in m and (m[key] is None or not math.isfinite(m[key])):
+                m[key] = DBFS_FLOOR
+    return j
+
+
 def row_from(j: dict) -> dict:
     """Extract row data from compare_report.json structure"""
     # Use slug field first, fallback to input file stem
@@ -59,41 +99,114 @@ def row_from(j: dict) -> dict:
     }
 
 
+def load_cache(path: pathlib.Path) -> dict:
+    """Load the row cache; a missing, corrupt or stale-schema cache is just empty"""
+    try:
+        with path.open("rb") as fp:
+            cache = pickle.load(fp)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        # Truncated file, or a pickle from another version (ImportError, AttributeError, ...)
+        print(f"[cache] ignoring {path}: {type(e).__name__}: {e}")
+        return {}
+    if not isinstance(cache, dict) or cache.get("fields") != FIELDS:
+        return {}
+    rows = cache.get("rows")
+    return rows if isinstance(rows, dict) else {}
+
+
+def save_cache(path: pathlib.Path, rows: dict):
+    """Persist the row cache atomically"""
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("wb") as fp:
+        pickle.dump({"fields": FIELDS, "rows": rows}, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _read(f):
+    """(stamp, bytes) for one report, or the exception; never raises inside the pool"""
+    try:
+        st = os.stat(f)
+        return (st.st_mtime_ns, st.st_size), pathlib.Path(f).read_bytes()
+    except OSError as e:
+        return None, e
+
+
+def load_rows(files, cache: dict, workers: int = 16):
+    """
+    Rows for files, re-parsing only reports whose mtime/size changed
+
+    Cache misses are read concurrently (file I/O releases the GIL), then
+    parsed serially. Returns (rows, fresh_cache); the fresh cache only holds
+    files seen this run.
+    """
+    stamps = {}
+    misses = []
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError as e:
+            print(f"[skip] {f}: {e}")
+            continue
+        stamps[f] = (st.st_mtime_ns, st.st_size)
+        hit = cache.get(f)
+        if hit is None or hit[0] != stamps[f]:
+            misses.append(f)
+
+    raw = {}
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as ex:
+            raw = dict(zip(misses, ex.map(_read, misses)))
+
+    rows = []
+    fresh = {}
+    for f in stamps:
+        if f in raw:
+            stamp, data = raw[f]
+            try:
+                if stamp is None:
+                    raise data
+                row = _as_tuple(row_from(parse_report(data)))
+            except Exception as e:
+                # Skip files that can't be parsed
+                print(f"[skip] {f}: {e}")
+                continue
+        else:
+            stamp, row = cache[f]
+        fresh[f] = (stamp, row)
+        rows.append(row)
+    return rows, fresh
+
+
 def write_csv(rows, path: pathlib.Path):
-    """Write rows to CSV file"""
+    """Write rows (tuples in FIELDS order) to CSV file"""
     if not rows:
         path.write_text("", encoding="utf-8")
         return
 
     with path.open("w", newline="", encoding="utf-8") as fp:
-        w = csv.DictWriter(fp, fieldnames=FIELDS)
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in FIELDS})
+        w = csv.writer(fp)
+        w.writerow(FIELDS)
+        w.writerows(rows)
 
 
 def write_md(rows, path: pathlib.Path, title_ts: str):
-    """Write rows to Markdown table"""
-    with path.open("w", encoding="utf-8") as fp:
-        fp.write(f"# TTS Compare Summary ({title_ts})\n\n")
-
-        if not rows:
-            fp.write("_No data found._\n")
-            return
+    """Write rows (tuples in FIELDS order) to Markdown table, rendered whole then written once"""
+    lines = [f"# TTS Compare Summary ({title_ts})", ""]
 
-        # Header
-        hdr = "| " + " | ".join(FIELDS) + " |\n"
-        sep = "| " + " | ".join(["---"] * len(FIELDS)) + " |\n"
-        fp.write(hdr)
-        fp.write(sep)
+    if not rows:
+        lines.append("_No data found._")
+    else:
+        lines.append("| " + " | ".join(FIELDS) + " |")
+        lines.append("| " + " | ".join(["---"] * len(FIELDS)) + " |")
+        lines.extend(_MD_ROW.format(*r) for r in rows)
 
-        # Rows
-        for r in rows:
-            fp.write("| " + " | ".join([str(r.get(k, "")) for k in FIELDS]) + " |\n")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
-def main():
-    """CLI interface"""
+def main(argv=None):
+    """CLI interface; argv lets callers (tests) run it in-process"""
     ap = argparse.ArgumentParser(
         description="Aggregate compare_report.json files to CSV/Markdown."
     )
@@ -105,21 +218,15 @@ def main():
                     help="Sort key (e.g., openai_rms,-openai_duration)")
     ap.add_argument("--limit", type=int, default=0,
                     help="Limit number of rows")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     outdir = pathlib.Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     files = sorted(glob(args.work_glob))
-    rows = []
-
-    for f in files:
-        try:
-            j = json.loads(pathlib.Path(f).read_text(encoding="utf-8"))
-            rows.append(row_from(j))
-        except Exception as e:
-            # Skip files that can't be parsed
-            print(f"[skip] {f}: {e}")
+    cache_path = outdir / CACHE_NAME
+    rows, cache = load_rows(files, load_cache(cache_path))
+    save_cache(cache_path, cache)
 
     # Sort if requested
     # Format: "key1,-key2" (- prefix for descending)
@@ -128,7 +235,10 @@ def main():
         for k in reversed(keys):
             rev = k.startswith("-")
             kk = k[1:] if rev else k
-            rows.sort(key=lambda r: (r.get(kk) is None, r.get(kk)), reverse=rev)
+            if kk not in FIELDS:
+                continue
+            i = FIELDS.index(kk)
+            rows.sort(key=lambda r: (r[i] is None, r[i]), reverse=rev)
 
     # Limit if requested
     if args.limit > 0:
@@ -143,7 +253,8 @@ def main():
     write_md(rows, mdp, ts)
 
     print(f"CSV: {csvp}\nMD:  {mdp}\nRows: {len(rows)}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
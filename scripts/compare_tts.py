@@ -6,17 +6,43 @@ Generates matched audio files and comprehensive comparison report
 
 import os
 import sys
-import json
 import argparse
+import hashlib
+import json
+import math
+import shutil
 import subprocess
 import uuid
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import orjson
 from loguru import logger
 from pydub import AudioSegment
 
 # Import common TTS utilities
 sys.path.insert(0, str(Path(__file__).parent))
-from tts_common import measure, match_volume
+from tts_common import measure, match_volume, dump_metrics, DBFS_FLOOR
+
+
+def load_metrics(path: Path) -> dict:
+    """
+    Read an engine's metrics JSON
+
+    Files from before dump_metrics() may hold -Infinity (json.dump; orjson rejects it)
+    or null (orjson) for the levels of a silent track; both are read back as the
+    silence floor, DBFS_FLOOR.
+    """
+    data = path.read_bytes()
+    try:
+        metrics = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        metrics = json.loads(data)
+    for key in ("rms_dbfs", "peak_dbfs"):
+        if key in metrics and (metrics[key] is None or not math.isfinite(metrics[key])):
+            metrics[key] = DBFS_FLOOR
+    return metrics
 
 
 def run_command(cmd: list, allow_fail: bool = False) -> subprocess.CompletedProcess:
@@ -43,6 +69,90 @@ def run_command(cmd: list, allow_fail: bool = False) -> subprocess.CompletedProc
     return result
 
 
+def ab_swap_mix(a: AudioSegment, b: AudioSegment, step_ms: int) -> AudioSegment:
+    """
+    Alternate step_ms slices of a and b (A, B, A, B, ...) over their common length
+
+    Works on int sample views of the raw PCM and concatenates once,
+    instead of growing an AudioSegment slice by slice.
+    """
+    # Bring both to a common format, as AudioSegment concatenation would
+    frame_rate = max(a.frame_rate, b.frame_rate)
+    channels = max(a.channels, b.channels)
+    width = max(a.sample_width, b.sample_width)
+    a, b = [seg.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(width)
+            for seg in (a, b)]
+
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[width]
+    pa = np.frombuffer(a.raw_data, dtype=dtype).reshape(-1, channels)
+    pb = np.frombuffer(b.raw_data, dtype=dtype).reshape(-1, channels)
+
+    step = max(1, int(step_ms * frame_rate / 1000))
+    limit = min(len(pa), len(pb))
+    parts = []
+    for pos in range(0, limit, step):
+        parts.append(pa[pos:pos + step])
+        parts.append(pb[pos:pos + step])
+
+    data = np.concatenate(parts).tobytes() if parts else b""
+    return AudioSegment(data=data, sample_width=width, frame_rate=frame_rate, channels=channels)
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file's bytes, read in 1 MiB blocks"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_matched(openai_out: Path, openai_format: str, piper_out: Optional[Path],
+                  outdir: Path, max_diff_db: float = 1.5) -> Tuple[List[Path], bool]:
+    """
+    Write openai_match.wav (and piper_match.wav when piper_out is given) into outdir
+
+    Matching only depends on the source audio and max_diff_db, so results are kept
+    in outdir/.match_cache keyed by the sources' sha256; reruns with unchanged
+    sources copy them instead of decoding, matching and re-encoding. Only the
+    current key's entries are kept: a miss drops the entries of older sources.
+
+    Returns:
+        (written paths, True if they came from the cache)
+    """
+    sources = [openai_out] + ([piper_out] if piper_out else [])
+    targets = [outdir / "openai_match.wav"] + ([outdir / "piper_match.wav"] if piper_out else [])
+    key = hashlib.sha256("|".join(
+        [*(file_digest(p) for p in sources), openai_format, str(max_diff_db)]
+    ).encode("utf-8")).hexdigest()
+    cache_dir = outdir / ".match_cache"
+    cached = [cache_dir / f"{key}.{t.name}" for t in targets]
+
+    if all(c.exists() for c in cached):
+        for c, t in zip(cached, targets):
+            shutil.copyfile(c, t)
+        return targets, True
+
+    # Explicit formats: no ffprobe round-trip to sniff them
+    matched = [AudioSegment.from_file(str(openai_out), format=openai_format)]
+    if piper_out:
+        piper_audio = AudioSegment.from_file(str(piper_out), format="wav")
+        matched = list(match_volume(matched[0], piper_audio, max_diff_db=max_diff_db))
+
+    # The outdir's match_*.wav are being replaced, so older cache entries can never hit again
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for stale in cache_dir.glob("*.wav"):
+        if not stale.name.startswith(key):
+            stale.unlink(missing_ok=True)
+    for audio, t, c in zip(matched, targets, cached):
+        audio.export(str(t), format="wav")
+        # Copy-then-rename so an interrupted run never leaves a partial entry
+        tmp = c.with_name(f"{c.name}.{os.getpid()}.tmp")
+        shutil.copyfile(t, tmp)
+        os.replace(tmp, c)
+    return targets, False
+
+
 def main():
     """CLI interface"""
     parser = argparse.ArgumentParser(
@@ -149,24 +259,16 @@ def main():
     # === 3) Volume matching ===
     logger.info("\n🔊 Creating volume-matched versions...")
 
-    # Load OpenAI audio as reference
-    openai_audio = AudioSegment.from_file(str(openai_out))
-    openai_match_path = outdir / "openai_match.wav"
-
-    # Create matched versions
-    if piper_ok:
-        piper_audio = AudioSegment.from_file(str(piper_out))
-        matched_openai, matched_piper = match_volume(openai_audio, piper_audio, max_diff_db=1.5)
-
-        matched_openai.export(str(openai_match_path), format="wav")
-        piper_match_path = outdir / "piper_match.wav"
-        matched_piper.export(str(piper_match_path), format="wav")
-
+    (openai_match_path, *rest), reused = write_matched(
+        openai_out, args.openai_format, piper_out if piper_ok else None, outdir, max_diff_db=1.5
+    )
+    if reused:
+        logger.info("   Sources unchanged: reused cached matched files")
+    if rest:
+        piper_match_path = rest[0]
         logger.info(f"   OpenAI matched: {openai_match_path.name}")
         logger.info(f"   Piper matched: {piper_match_path.name}")
     else:
-        # Just copy OpenAI if no Piper
-        openai_audio.export(str(openai_match_path), format="wav")
         logger.info(f"   OpenAI only: {openai_match_path.name}")
 
     # === 4) Generate comparison report ===
@@ -189,11 +291,11 @@ def main():
 
     # Load OpenAI metrics
     if openai_metrics.exists():
-        report["openai"] = json.loads(openai_metrics.read_text())
+        report["openai"] = load_metrics(openai_metrics)
 
     # Load Piper metrics
     if piper_ok and piper_metrics.exists():
-        report["piper"] = json.loads(piper_metrics.read_text())
+        report["piper"] = load_metrics(piper_metrics)
     else:
         report["piper"] = {"status": "skipped", "reason": "Piper not available"}
 
@@ -213,7 +315,8 @@ def main():
 
     # Save report
     report_path = workdir / "compare_report.json"
-    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    # Non-finite levels become DBFS_FLOOR rather than null (report readers expect numbers)
+    report_path.write_bytes(dump_metrics(report))
 
     logger.success(f"✅ Comparison report: {report_path}")
 
@@ -221,20 +324,10 @@ def main():
     if args.ab_swap_sec > 0 and piper_ok:
         logger.info(f"\n🔀 Creating AB swap mix ({args.ab_swap_sec}s segments)...")
 
-        openai_matched = AudioSegment.from_file(str(openai_match_path))
-        piper_matched = AudioSegment.from_file(str(piper_match_path))
-
-        ab_mix = AudioSegment.silent(duration=0)
-        step_ms = args.ab_swap_sec * 1000
-        pos = 0
-        max_len = min(len(openai_matched), len(piper_matched))
+        openai_matched = AudioSegment.from_file(str(openai_match_path), format="wav")
+        piper_matched = AudioSegment.from_file(str(piper_match_path), format="wav")
 
-        while pos < max_len:
-            # Add OpenAI segment
-            ab_mix += openai_matched[pos:pos + step_ms]
-            # Add Piper segment
-            ab_mix += piper_matched[pos:pos + step_ms]
-            pos += step_ms
+        ab_mix = ab_swap_mix(openai_matched, piper_matched, args.ab_swap_sec * 1000)
 
         ab_out = outdir / "AB_openai_piper.wav"
         ab_mix.export(str(ab_out), format="wav")
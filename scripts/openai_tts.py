@@ -5,49 +5,84 @@ Refactored to use tts_common for segmentation and post-processing
 """
 
 import os
+import re
 import sys
 import io
-import json
-import yaml
 import argparse
+import random
+import subprocess
+import time
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Any, List
-from openai import OpenAI
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Union
+import openai
+from openai import OpenAI, DefaultHttpxClient
 from pydub import AudioSegment
 from loguru import logger
+from tqdm import tqdm
+
+# httpx is the OpenAI SDK's transport; used directly only to size the connection pool
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# HTTP/2 needs the optional h2 package (pip install 'httpx[http2]')
+try:
+    import h2  # noqa: F401
+    HAVE_HTTP2 = True
+except ImportError:
+    HAVE_HTTP2 = False
 
 # Import common TTS utilities
 try:
-    from tts_common import segment_text, build_track, measure, apply_style_prefix
+    from tts_common import segment_text, iter_segments, build_track, measure, export_track, dump_metrics
+    from tts_cache import CACHE_DIR, _CACHE_STATS, get_or_synth, prune
+    from _cfg import cached_yaml
 except ImportError:
     # For when run from scripts/ directory
     import sys
     sys.path.insert(0, str(Path(__file__).parent))
-    from tts_common import segment_text, build_track, measure, apply_style_prefix
+    from tts_common import segment_text, iter_segments, build_track, measure, export_track, dump_metrics
+    from tts_cache import CACHE_DIR, _CACHE_STATS, get_or_synth, prune
+    from _cfg import cached_yaml
+
+
+# Repo root: .env, config.yaml and presets.yaml live here
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 
 # Load environment variables from .env file
+_ENV_LOADED = False
+
+# KEY=value lines (blank, comment and malformed lines simply don't match)
+_ENV_LINE = re.compile(r'^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t]*\r?$', re.M)
+
+
 def load_env():
-    """Load .env file from project root"""
-    env_path = Path(__file__).parent.parent / ".env"
-    if env_path.exists():
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    value = os.path.expandvars(value)
-                    value = os.path.expanduser(value)
-                    os.environ[key] = value
+    """Load .env file from project root (once per process)"""
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    _ENV_LOADED = True
+
+    env_path = PROJECT_ROOT / ".env"
+    if not env_path.exists():
+        return
+    # Assigned one at a time so later lines can reference earlier keys (B=$A/out)
+    for key, value in _ENV_LINE.findall(env_path.read_text(encoding='utf-8')):
+        if not value.startswith('#'):
+            os.environ[key] = _expand_str(value)
 
 
 def load_presets() -> Dict[str, Any]:
     """Load voice presets from presets.yaml"""
-    presets_path = Path(__file__).parent.parent / "presets.yaml"
+    presets_path = PROJECT_ROOT / "presets.yaml"
     if presets_path.exists():
         try:
-            with open(presets_path) as f:
-                return yaml.safe_load(f) or {}
+            return cached_yaml(presets_path)
         except Exception as e:
             logger.warning(f"Failed to load presets.yaml: {e}")
     return {}
@@ -55,34 +90,51 @@ def load_presets() -> Dict[str, Any]:
 
 def load_config() -> Dict[str, Any]:
     """Load config.yaml for default settings"""
-    config_path = Path(__file__).parent.parent / "config.yaml"
+    config_path = PROJECT_ROOT / "config.yaml"
     if config_path.exists():
         try:
-            with open(config_path) as f:
-                config = yaml.safe_load(f) or {}
-                # Expand environment variables in config values
-                return expand_env_vars(config)
+            config = cached_yaml(config_path)
+            # Expand environment variables in config values (after the cache: env may differ per run)
+            return expand_env_vars(config)
         except Exception as e:
             logger.warning(f"Failed to load config.yaml: {e}")
     return {}
 
 
+def _expand_str(value: str) -> str:
+    """$VAR / ~ expansion, skipped for the (usual) strings that contain neither"""
+    if '$' not in value and not value.startswith('~'):
+        return value
+    return os.path.expanduser(os.path.expandvars(value))
+
+
 def expand_env_vars(obj):
     """Recursively expand environment variables in config"""
-    if isinstance(obj, dict):
+    if isinstance(obj, str):
+        return _expand_str(obj)
+    elif isinstance(obj, dict):
         return {k: expand_env_vars(v) for k, v in obj.items()}
     elif isinstance(obj, list):
         return [expand_env_vars(item) for item in obj]
-    elif isinstance(obj, str):
-        expanded = os.path.expandvars(obj)
-        expanded = os.path.expanduser(expanded)
-        return expanded
     return obj
 
 
+def flatten_config(obj: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Nested config -> {"tts.model": value, ...}, one entry per leaf"""
+    flat = {}
+    for key, value in obj.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_config(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+
 # Initialize
 load_env()
 CONFIG = load_config()
+FLAT_CONFIG = flatten_config(CONFIG)
 PRESETS = load_presets()
 
 # Voice categories
@@ -90,12 +142,12 @@ MALE_VOICES = ["alloy", "echo", "fable", "onyx"]
 FEMALE_VOICES = ["nova", "shimmer"]
 ALL_VOICES = MALE_VOICES + FEMALE_VOICES
 
-# Pause profiles (seconds)
-PAUSE_PROFILES = {
-    "broadcast": {"short": 0.30, "medium": 0.60, "long": 1.00},
-    "natural": {"short": 0.25, "medium": 0.50, "long": 0.80},
-    "tight": {"short": 0.15, "medium": 0.35, "long": 0.60},
-}
+# Pause profiles (seconds); read-only so the module can be shared safely
+PAUSE_PROFILES = MappingProxyType({
+    "broadcast": MappingProxyType({"short": 0.30, "medium": 0.60, "long": 1.00}),
+    "natural": MappingProxyType({"short": 0.25, "medium": 0.50, "long": 0.80}),
+    "tight": MappingProxyType({"short": 0.15, "medium": 0.35, "long": 0.60}),
+})
 
 # Built-in voice presets
 _BUILTIN_PRESETS = {
@@ -135,31 +187,108 @@ _BUILTIN_PRESETS = {
     },
 }
 
-# Merge loaded presets with built-in presets (loaded take precedence)
-VOICE_PRESETS = {**_BUILTIN_PRESETS, **PRESETS}
+# Merge loaded presets with built-in presets (loaded take precedence), frozen like PAUSE_PROFILES
+VOICE_PRESETS = MappingProxyType({
+    name: MappingProxyType(preset) if isinstance(preset, dict) else preset
+    for name, preset in {**_BUILTIN_PRESETS, **PRESETS}.items()
+})
+
+
+# Segments are requested as raw PCM: the bytes are the samples, no header and no ffmpeg decode
+SEGMENT_FORMAT = "pcm"
+
+# Raw "pcm" responses are headerless 24 kHz 16-bit mono
+PCM_FRAME_RATE = 24000
+
+
+def decode_audio(audio_data: Union[bytes, Path], response_format: str) -> AudioSegment:
+    """Bytes or a file from the API (or the cache) -> AudioSegment; wav/pcm never touch ffmpeg"""
+    if response_format == "pcm":
+        if isinstance(audio_data, Path):
+            audio_data = audio_data.read_bytes()
+        return AudioSegment(data=audio_data, sample_width=2, frame_rate=PCM_FRAME_RATE, channels=1)
+    if isinstance(audio_data, Path):
+        return AudioSegment.from_file(str(audio_data), format=response_format)
+    return AudioSegment.from_file(io.BytesIO(audio_data), format=response_format)
+
+
+# Rate limits, 5xx and dropped connections (incl. timeouts) are worth another try; anything else is not
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+MAX_ATTEMPTS = 5
+
+
+def _stream_speech(client: OpenAI, path: Path, text: str, model: str, voice: str,
+                   response_format: str) -> None:
+    """Write one /audio/speech response body to path as it arrives, retrying transient errors"""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with client.audio.speech.with_streaming_response.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=response_format
+            ) as response:
+                with open(path, "wb") as f:
+                    for chunk in response.iter_bytes():
+                        f.write(chunk)
+            return
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2 ** attempt + random.random(), 30)
+            logger.warning(f"{type(e).__name__}, retrying in {delay:.1f}s ({attempt + 2}/{MAX_ATTEMPTS})")
+            time.sleep(delay)
 
 
 def synthesize_segment(client: OpenAI, text: str, model: str, voice: str,
-                       response_format: str = "mp3") -> AudioSegment:
-    """Synthesize a single text segment using OpenAI TTS"""
+                       response_format: str = "mp3",
+                       cache_dir: Optional[Path] = None,
+                       fail_fast: bool = False) -> AudioSegment:
+    """
+    Synthesize a single text segment using OpenAI TTS (served from cache_dir when seen before)
+
+    Transient API errors are retried with exponential backoff. Once retries are
+    exhausted, or on a permanent error, fail_fast raises; otherwise the error is
+    logged and 100 ms of silence stands in for the segment.
+    """
+    # The response body streams straight to disk (next to the cache entry when caching)
+    # instead of being held in memory as response.content
     try:
-        response = client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text,
-            response_format=response_format
+        return get_or_synth(
+            cache_dir, (model, voice, response_format, text), response_format,
+            produce=lambda path: _stream_speech(client, path, text, model, voice, response_format),
+            decode=lambda path: decode_audio(path, response_format),
         )
 
-        # Convert to AudioSegment
-        audio_data = response.content
-        return AudioSegment.from_file(io.BytesIO(audio_data), format=response_format)
-
     except Exception as e:
+        if fail_fast:
+            raise
         logger.error(f"Synthesis error: {e}")
         # Return silent segment on error
         return AudioSegment.silent(duration=100)
 
 
+def make_client(api_key: str, concurrency: int) -> OpenAI:
+    """
+    OpenAI client whose keep-alive pool covers every worker thread
+
+    The SDK default keeps fewer idle connections than a large --concurrency
+    needs, so bursts would re-handshake TLS; with h2 installed all requests
+    share one multiplexed HTTP/2 connection.
+    """
+    # synthesize_segment does its own backoff; SDK retries on top would multiply the attempts
+    if httpx is None:
+        return OpenAI(api_key=api_key, max_retries=0)
+
+    pool = max(1, concurrency)
+    http_client = DefaultHttpxClient(
+        http2=HAVE_HTTP2,
+        limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    return OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+
 def resolve_defaults(args: argparse.Namespace, config: Dict, presets: Dict) -> argparse.Namespace:
     """
     Resolve configuration priority: CLI args > preset > config.yaml > env > hardcoded defaults
@@ -178,6 +307,9 @@ def resolve_defaults(args: argparse.Namespace, config: Dict, presets: Dict) -> a
         preset = presets[args.preset]
         logger.info(f"Using preset: {args.preset} - {preset.get('description', '')}")
 
+    # Dotted-path lookups below are single hash hits on the flattened config
+    flat = FLAT_CONFIG if config is CONFIG else flatten_config(config)
+
     # Helper to get value with priority: CLI > preset > config > env > default
     def get_value(arg_name, preset_key, config_path, env_var, default):
         # If explicitly set via CLI
@@ -189,12 +321,9 @@ def resolve_defaults(args: argparse.Namespace, config: Dict, presets: Dict) -> a
         if preset_key in preset:
             return preset[preset_key]
 
-        # Check config.yaml (navigate nested dict)
-        config_val = config
-        for key in config_path.split('.'):
-            config_val = config_val.get(key, {}) if isinstance(config_val, dict) else {}
-        if config_val != {}:
-            return config_val
+        # Check config.yaml
+        if config_path in flat:
+            return flat[config_path]
 
         # Check environment
         if env_var and env_var in os.environ:
@@ -229,6 +358,7 @@ def resolve_defaults(args: argparse.Namespace, config: Dict, presets: Dict) -> a
     args.crossfade_ms = get_value('crossfade_ms', 'crossfade_ms', 'tts.crossfade_ms', None, 50)
     args.max_chars = get_value('max_chars', 'max_chars', 'tts.max_chars', None, 800)
     args.style_prefix = get_value('style_prefix', 'style_prefix', 'tts.style_prefix', None, None)
+    args.concurrency = get_value('concurrency', 'concurrency', 'tts.concurrency', 'OPENAI_TTS_CONCURRENCY', 6)
 
     return args
 
@@ -267,6 +397,9 @@ Examples:
 
     # Voice selection
     parser.add_argument("--voice", "-v", choices=ALL_VOICES, help="Voice to use")
+    parser.add_argument("--male-voices", action="store_true",
+                        help=f"Render every male voice ({', '.join(MALE_VOICES)}) from one segmentation; "
+                             "outputs get a _<voice> suffix")
     parser.add_argument("--preset", choices=list(VOICE_PRESETS.keys()),
                         help="Use voice preset (overrides other settings)")
 
@@ -296,18 +429,17 @@ Examples:
     # Output options (NEW)
     parser.add_argument("--json-out", help="Save metrics to JSON file")
 
-    args = parser.parse_args()
-
-    # Read input text
-    try:
-        text = Path(args.input).read_text(encoding="utf-8").strip()
-    except Exception as e:
-        logger.error(f"Failed to read input file: {e}")
-        return 1
+    # Throughput
+    parser.add_argument("--concurrency", type=int,
+                        help="Parallel TTS requests (default: 6)")
+    parser.add_argument("--cache-dir", help=f"Segment cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API; don't read or write the segment cache")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="Abort on a segment that still fails after retries (default: log it and insert silence)")
+    parser.add_argument("--fast-assemble", action="store_true",
+                        help="Skip crossfades: join chunks with plain pauses (no overlap mixing)")
 
-    if not text:
-        logger.error("Input file is empty")
-        return 1
+    args = parser.parse_args()
 
     # Resolve all configuration with proper priority
     args = resolve_defaults(args, CONFIG, VOICE_PRESETS)
@@ -318,79 +450,138 @@ Examples:
         logger.error("OPENAI_API_KEY not found in environment")
         return 1
 
-    client = OpenAI(api_key=api_key)
+    client = make_client(api_key, int(args.concurrency))
 
-    # Apply style prefix if specified
+    # Style prefix: its own paragraph ahead of the text, as tts_common.apply_style_prefix lays it out
+    prefix_segments = []
     if args.style_prefix:
-        text = apply_style_prefix(text, args.style_prefix)
-        logger.info(f"Applied style prefix: {args.style_prefix[:50]}...")
-
-    # Segment text using tts_common
-    segments = segment_text(text, max_chars=args.max_chars, mode="sentence")
-    logger.info(f"Segmented into {len(segments)} chunks (max {args.max_chars} chars each)")
+        prefix_segments = segment_text(args.style_prefix, max_chars=args.max_chars, mode="sentence")
+        logger.info(f"Applied style prefix: {args.style_prefix[:50]}{'...' if len(args.style_prefix) > 50 else ''}")
 
     # Synthesize each segment
     logger.info(f"🎙️  Synthesizing with OpenAI TTS...")
-    logger.info(f"   Voice: {args.voice}, Model: {args.model}, Format: {args.format}")
+    voices = list(MALE_VOICES) if args.male_voices else [args.voice]
+    logger.info(f"   Voice: {', '.join(voices)}, Model: {args.model}, Format: {args.format}")
     logger.info(f"   Pauses: short={args.pause_short}s, medium={args.pause_medium}s, long={args.pause_long}s")
 
-    chunks: List[AudioSegment] = []
-    for i, seg in enumerate(segments, 1):
-        logger.info(f"   [{i}/{len(segments)}] Synthesizing: {seg[:60]}...")
-        audio = synthesize_segment(client, seg, args.model, args.voice, "mp3")
-        chunks.append(audio)
-
-    # Build track using tts_common
-    logger.info("Building final track with pauses and crossfades...")
-    track = build_track(
-        chunks,
-        pause_short=args.pause_short,
-        pause_medium=args.pause_medium,
-        pause_long=args.pause_long,
-        fade_ms=args.fade_ms,
-        crossfade_ms=args.crossfade_ms,
-        normalize=args.normalize,
-        speed=args.speed
-    )
+    cache_dir = None if args.no_cache else Path(args.cache_dir or CACHE_DIR)
+    logger.info(f"   Concurrency: {args.concurrency} requests, cache: {cache_dir or 'off'}")
 
-    # Ensure output directory exists
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Export to final format
-    logger.info(f"Exporting to {args.format}...")
-    track.export(str(output_path), format=args.format)
-
-    # Measure and log metrics
-    metrics = measure(track)
-    file_size_mb = output_path.stat().st_size / (1024 * 1024)
-
-    logger.success(f"✅ Audio generated: {output_path}")
-    logger.info(f"   Duration: {metrics['duration_sec']:.2f}s")
-    logger.info(f"   RMS: {metrics['rms_dbfs']:.1f} dBFS")
-    logger.info(f"   Peak: {metrics['peak_dbfs']:.1f} dBFS")
-    logger.info(f"   Silence: {metrics['silence_ratio']:.1f}%")
-    logger.info(f"   File size: {file_size_mb:.2f} MB")
-
-    # Save metrics to JSON if requested
-    if args.json_out:
-        json_path = Path(args.json_out)
-        json_path.parent.mkdir(parents=True, exist_ok=True)
-
-        metrics_full = {
-            **metrics,
-            "file_size_mb": round(file_size_mb, 2),
-            "segments": len(segments),
-            "voice": args.voice,
-            "model": args.model,
-            "format": args.format,
-            "speed": args.speed
-        }
-
-        with open(json_path, 'w') as f:
-            json.dump(metrics_full, f, indent=2)
-
-        logger.info(f"   Metrics saved to: {json_path}")
+    # Segments are independent network round-trips: run them side by side, keep input order.
+    # Progress is one bar advanced from this thread, so workers never wait on the log sink.
+    def synthesize(voice: str, seg: str) -> AudioSegment:
+        return synthesize_segment(client, seg, args.model, voice, SEGMENT_FORMAT,
+                                  cache_dir=cache_dir, fail_fast=args.fail_fast)
+
+    # One client (and keep-alive pool) for the whole fan-out, closed as soon as synthesis ends.
+    # Every voice's segments share the executor, so voices render side by side too.
+    segments: List[str] = []
+    futures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(args.concurrency))) as ex:
+            # The input is segmented paragraph by paragraph as it is read, and each new segment
+            # is submitted right away; repeated segments (headers, recurring phrases) are
+            # requested once and reused
+            try:
+                with open(args.input, encoding="utf-8") as input_file:
+                    for seg in chain(prefix_segments, iter_segments(input_file, max_chars=args.max_chars)):
+                        segments.append(seg)
+                        for voice in voices:
+                            if (voice, seg) not in futures:
+                                futures[(voice, seg)] = ex.submit(synthesize, voice, seg)
+            except (OSError, UnicodeDecodeError) as e:
+                for fut in futures.values():
+                    fut.cancel()
+                logger.error(f"Failed to read input file: {e}")
+                return 1
+
+            if len(segments) == len(prefix_segments):
+                logger.error("Input file is empty")
+                return 1
+
+            logger.info(f"Segmented into {len(segments)} chunks (max {args.max_chars} chars each)")
+            repeated = len(segments) - len(futures) // len(voices)
+            if repeated:
+                logger.info(f"   {repeated} repeated segments reuse earlier audio")
+
+            for _ in tqdm(as_completed(futures.values()), total=len(futures), desc="TTS", unit="seg"):
+                pass
+            try:
+                voice_chunks: Dict[str, List[AudioSegment]] = {
+                    voice: [futures[(voice, seg)].result() for seg in segments] for voice in voices
+                }
+            except Exception as e:
+                for fut in futures.values():
+                    fut.cancel()
+                logger.error(f"Synthesis failed: {e}")
+                return 1
+    finally:
+        client.close()
+
+    # Keep the cache under its size cap (least recently used entries go first)
+    if cache_dir is not None:
+        logger.info(f"   Segment cache: {_CACHE_STATS['hits']} hits / {_CACHE_STATS['misses']} misses")
+        prune(cache_dir)
+
+    for voice in voices:
+        # Build track using tts_common
+        logger.info("Building final track with pauses and crossfades...")
+        track = build_track(
+            voice_chunks[voice],
+            pause_short=args.pause_short,
+            pause_medium=args.pause_medium,
+            pause_long=args.pause_long,
+            fade_ms=args.fade_ms,
+            crossfade_ms=0 if args.fast_assemble else args.crossfade_ms,
+            normalize=args.normalize,
+            speed=args.speed
+        )
+
+        # Ensure output directory exists
+        output_path = Path(args.output)
+        if args.male_voices:
+            output_path = output_path.with_name(f"{output_path.stem}_{voice}{output_path.suffix}")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Export to final format: wav and pcm need no ffmpeg, compressed formats pipe into one encode
+        logger.info(f"Exporting to {args.format}...")
+        try:
+            export_track(track, output_path, args.format)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"ffmpeg export failed: {e.stderr.decode('utf-8', 'ignore')}")
+            return 1
+
+        # Measure and log metrics
+        metrics = measure(track)
+        file_size_mb = output_path.stat().st_size / (1024 * 1024)
+
+        logger.success(f"✅ Audio generated: {output_path}")
+        logger.info(f"   Duration: {metrics['duration_sec']:.2f}s")
+        logger.info(f"   RMS: {metrics['rms_dbfs']:.1f} dBFS")
+        logger.info(f"   Peak: {metrics['peak_dbfs']:.1f} dBFS")
+        logger.info(f"   Silence: {metrics['silence_ratio']:.1f}%")
+        logger.info(f"   File size: {file_size_mb:.2f} MB")
+
+        # Save metrics to JSON if requested
+        if args.json_out:
+            json_path = Path(args.json_out)
+            if args.male_voices:
+                json_path = json_path.with_name(f"{json_path.stem}_{voice}{json_path.suffix}")
+            json_path.parent.mkdir(parents=True, exist_ok=True)
+
+            metrics_full = {
+                **metrics,
+                "file_size_mb": round(file_size_mb, 2),
+                "segments": len(segments),
+                "voice": voice,
+                "model": args.model,
+                "format": args.format,
+                "speed": args.speed
+            }
+
+            json_path.write_bytes(dump_metrics(metrics_full))
+
+            logger.info(f"   Metrics saved to: {json_path}")
 
     return 0
 
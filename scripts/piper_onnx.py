@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Piper ONNX - In-process Piper voice via onnxruntime + piper-phonemize
+Same interface as PiperSession, but no piper binary, no subprocess, no pipes.
+Optional: pip install onnxruntime piper-phonemize (falls back to PiperSession otherwise)
+"""
+
+import json
+import wave
+from pathlib import Path
+from loguru import logger
+from pydub import AudioSegment
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from piper_phonemize import phonemize_espeak
+except ImportError:
+    ort = None
+
+# Special phoneme symbols used by Piper voice configs
+PAD, BOS, EOS = "_", "^", "$"
+
+# Execution providers in order of preference (GPU / Apple Neural Engine first, CPU last)
+PREFERRED_PROVIDERS = ["CUDAExecutionProvider", "CoreMLExecutionProvider", "CPUExecutionProvider"]
+
+
+def onnx_available(model: str) -> bool:
+    """True if the runtime deps are installed and the voice config (.onnx.json) exists"""
+    return ort is not None and Path(f"{model}.json").exists()
+
+
+def select_providers(preferred=PREFERRED_PROVIDERS) -> list:
+    """Preferred providers that this onnxruntime build actually offers (CPU always last)"""
+    available = set(ort.get_available_providers())
+    chosen = [p for p in preferred if p in available]
+    if "CPUExecutionProvider" not in chosen:
+        chosen.append("CPUExecutionProvider")
+    return chosen
+
+
+class PiperOnnx:
+    """
+    Piper VITS voice loaded once into an onnxruntime InferenceSession
+
+    Usage:
+        with PiperOnnx(model_path) as piper:
+            piper.synthesize_to("Hello.", "out.wav")
+            audio = piper.synthesize("World.")
+    """
+
+    def __init__(self, model: str, speaker_id: int = 0, providers=None, threads: int = 0):
+        if ort is None:
+            raise RuntimeError("onnxruntime / piper-phonemize not installed")
+        self.model = str(model)
+        self.config = json.loads(Path(f"{self.model}.json").read_text(encoding="utf-8"))
+        self.sample_rate = self.config["audio"]["sample_rate"]
+        self.voice = self.config["espeak"]["voice"]
+        self.id_map = self.config["phoneme_id_map"]
+        inference = self.config.get("inference", {})
+        self.scales = np.array([
+            inference.get("noise_scale", 0.667),
+            inference.get("length_scale", 1.0),
+            inference.get("noise_w", 0.8),
+        ], dtype=np.float32)
+        self.speaker_id = speaker_id if self.config.get("num_speakers", 1) > 1 else None
+
+        opts = ort.SessionOptions()
+        if threads > 0:
+            # Cap per-session threads when several voices run side by side
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model, sess_options=opts,
+                                            providers=providers or select_providers())
+        # ORT silently drops providers that fail to initialise; report what is really in use
+        logger.info(f"Piper ONNX voice on {self.session.get_providers()[0]}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def phoneme_ids(self, phonemes) -> list:
+        """BOS, then each known phoneme followed by PAD, then EOS"""
+        ids = list(self.id_map[BOS])
+        for ph in phonemes:
+            if ph in self.id_map:
+                ids.extend(self.id_map[ph])
+                ids.extend(self.id_map[PAD])
+        ids.extend(self.id_map[EOS])
+        return ids
+
+    def pcm16(self, text: str) -> bytes:
+        """Synthesize text sentence by sentence; returns mono 16-bit PCM bytes"""
+        parts = []
+        for sentence in phonemize_espeak(text, self.voice):
+            ids = self.phoneme_ids(sentence)
+            inputs = {
+                "input": np.array([ids], dtype=np.int64),
+                "input_lengths": np.array([len(ids)], dtype=np.int64),
+                "scales": self.scales,
+            }
+            if self.speaker_id is not None:
+                inputs["sid"] = np.array([self.speaker_id], dtype=np.int64)
+
+            audio = self.session.run(None, inputs)[0].squeeze()
+            peak = max(0.01, float(np.max(np.abs(audio))))
+            parts.append(np.clip(audio * (32767.0 / peak), -32767, 32767).astype(np.int16))
+
+        if not parts:
+            return b""
+        return np.concatenate(parts).tobytes()
+
+    def synthesize_to(self, text: str, output_file) -> Path:
+        """Synthesize text into output_file (WAV) and return its path"""
+        output_file = Path(output_file)
+        with wave.open(str(output_file), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.pcm16(text))
+        return output_file
+
+    def synthesize(self, text: str) -> AudioSegment:
+        """Synthesize text and return it as an AudioSegment"""
+        return AudioSegment(
+            data=self.pcm16(text),
+            sample_width=2,
+            frame_rate=self.sample_rate,
+            channels=1
+        )
+
+    def close(self):
+        self.session = None
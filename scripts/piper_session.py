@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Piper Session - One long-lived piper process for many utterances
+The voice model (ONNX + eSpeak) is loaded once; each request is a JSON line on stdin
+and piper answers with the path of the WAV it wrote on stdout.
+open_piper() prefers the in-process onnxruntime voice (piper_onnx) when it is installed.
+"""
+
+import json
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Optional
+from pydub import AudioSegment
+from piper_onnx import PiperOnnx, onnx_available
+
+
+class PiperSession:
+    """
+    Context manager around `piper --json-input`
+
+    Usage:
+        with PiperSession(model_path) as piper:
+            piper.synthesize_to("Hello.", "out.wav")
+            audio = piper.synthesize("World.")
+    """
+
+    def __init__(self, model: str, piper_exec: str = "piper", extra_args=()):
+        self.model = str(model)
+        self.piper_exec = piper_exec
+        self.extra_args = list(extra_args)
+        self.proc: Optional[subprocess.Popen] = None
+        self._tmpdir: Optional[Path] = None
+        self._log = None
+        self._count = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def start(self):
+        """Spawn piper once; stderr goes to a log file so it can never block the pipe"""
+        if self.proc is not None:
+            return
+        self._tmpdir = Path(tempfile.mkdtemp(prefix="piper_"))
+        self._log = open(self._tmpdir / "piper.log", "w+b")
+        cmd = [self.piper_exec, "--model", self.model, "--json-input",
+               "--output_dir", str(self._tmpdir), *self.extra_args]
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self._log,
+            text=True,
+            encoding="utf-8",
+            bufsize=1
+        )
+
+    def _stderr_tail(self, limit: int = 500) -> str:
+        if self._log is None:
+            return ""
+        self._log.flush()
+        self._log.seek(0)
+        return self._log.read().decode("utf-8", "ignore")[-limit:]
+
+    def synthesize_to(self, text: str, output_file) -> Path:
+        """Synthesize text into output_file (WAV) and return its path"""
+        if self.proc is None:
+            self.start()
+        output_file = Path(output_file)
+        request = json.dumps({"text": text, "output_file": str(output_file.resolve())},
+                             ensure_ascii=False, separators=(",", ":"))
+        try:
+            self.proc.stdin.write(request + "\n")
+            self.proc.stdin.flush()
+            reply = self.proc.stdout.readline()
+        except (BrokenPipeError, OSError):
+            reply = ""
+
+        if not reply:
+            raise RuntimeError(f"piper exited unexpectedly: {self._stderr_tail()}")
+        return output_file
+
+    def synthesize(self, text: str) -> AudioSegment:
+        """Synthesize text and return it as an AudioSegment"""
+        self._count += 1
+        wav = self.synthesize_to(text, self._tmpdir / f"utt_{self._count:05d}.wav")
+        audio = AudioSegment.from_file(str(wav), format="wav")
+        wav.unlink(missing_ok=True)
+        return audio
+
+    def close(self):
+        """Close stdin so piper drains and exits, then clean up"""
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+
+def open_piper(model: str, piper_exec: str = "piper", threads: int = 0):
+    """In-process ONNX voice when available, otherwise a persistent piper process"""
+    if onnx_available(model):
+        return PiperOnnx(model, threads=threads)
+    return PiperSession(model, piper_exec)
@@ -6,30 +6,64 @@ Uses tts_common for consistent segmentation and post-processing with OpenAI TTS
 
 import os
 import sys
-import io
-import json
+import orjson
 import argparse
+import atexit
+import functools
 import shutil
 import subprocess
-import tempfile
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 from typing import List
 from loguru import logger
+from tqdm import tqdm
 from pydub import AudioSegment
 
 # Import common TTS utilities
 try:
-    from tts_common import segment_text, build_track, measure, apply_style_prefix
+    from tts_common import segment_text, build_track, measure, apply_style_prefix, export_track, dump_metrics
+    from piper_session import open_piper, onnx_available
+    from tts_cache import CACHE_DIR, _CACHE_STATS, get_or_synth, prune
 except ImportError:
     sys.path.insert(0, str(Path(__file__).parent))
-    from tts_common import segment_text, build_track, measure, apply_style_prefix
+    from tts_common import segment_text, build_track, measure, apply_style_prefix, export_track, dump_metrics
+    from piper_session import open_piper, onnx_available
+    from tts_cache import CACHE_DIR, _CACHE_STATS, get_or_synth, prune
 
 
+@functools.lru_cache(maxsize=None)
 def have_piper() -> bool:
-    """Check if Piper is installed and available"""
+    """Check if Piper is installed and available (PATH is scanned once per process)"""
     return shutil.which("piper") is not None
 
 
+# One persistent piper process per voice for synthesize_with_piper callers; closed at exit
+_SESSIONS = {}
+
+
+def _session_for(voice_path: str):
+    session = _SESSIONS.get(voice_path)
+    if session is None:
+        session = _SESSIONS[voice_path] = open_piper(voice_path).__enter__()
+    return session
+
+
+@atexit.register
+def _close_sessions():
+    while _SESSIONS:
+        _SESSIONS.popitem()[1].close()
+
+
+def voice_sample_rate(voice_path: str, default: int = 22050) -> int:
+    """Output sample rate from the voice config (<model>.onnx.json); Piper's default if absent"""
+    try:
+        return int(orjson.loads(Path(f"{voice_path}.json").read_bytes())["audio"]["sample_rate"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return default
+
+
 def synthesize_with_piper(text: str, voice_path: str) -> AudioSegment:
     """
     Synthesize text using Piper TTS
@@ -40,15 +74,21 @@ def synthesize_with_piper(text: str, voice_path: str) -> AudioSegment:
 
     Returns:
         AudioSegment with synthesized audio
+
+    Repeated calls reuse one long-running voice (model loaded once), not a
+    piper fork per call; a one-shot `piper` run is the fallback.
     """
-    # Piper supports both file output and stdout modes
-    # Try file output first (more reliable)
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tf:
-        tmpwav = tf.name
+    try:
+        return _session_for(voice_path).synthesize(text)
+    except (RuntimeError, OSError) as e:
+        session = _SESSIONS.pop(voice_path, None)
+        if session is not None:
+            session.close()
+        logger.info(f"Piper session failed ({e}), trying one-shot stdout mode...")
 
     try:
-        # File output mode: piper -m model.onnx -f output.wav < input.txt
-        cmd = ["piper", "-m", voice_path, "-f", tmpwav]
+        # Raw 16-bit mono samples on stdout: no temp file and no WAV header to parse
+        cmd = ["piper", "-m", voice_path, "--output_raw"]
         result = subprocess.run(
             cmd,
             input=text.encode("utf-8"),
@@ -56,32 +96,12 @@ def synthesize_with_piper(text: str, voice_path: str) -> AudioSegment:
             stderr=subprocess.PIPE,
             check=True
         )
-
-        audio = AudioSegment.from_file(tmpwav, format="wav")
-        os.unlink(tmpwav)
-        return audio
+        return AudioSegment(data=result.stdout, sample_width=2,
+                            frame_rate=voice_sample_rate(voice_path), channels=1)
 
     except subprocess.CalledProcessError as e:
-        # Cleanup temp file
-        if os.path.exists(tmpwav):
-            os.unlink(tmpwav)
-
-        # Try stdout mode as fallback
-        try:
-            logger.info("File mode failed, trying stdout mode...")
-            cmd = ["piper", "-m", voice_path]
-            result = subprocess.run(
-                cmd,
-                input=text.encode("utf-8"),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
-            )
-            return AudioSegment.from_file(io.BytesIO(result.stdout), format="wav")
-
-        except subprocess.CalledProcessError as e2:
-            logger.error(f"Piper synthesis failed: {e2.stderr.decode('utf-8', 'ignore')}")
-            raise
+        logger.error(f"Piper synthesis failed: {e.stderr.decode('utf-8', 'ignore')}")
+        raise
 
 
 def main():
@@ -108,21 +128,26 @@ def main():
     parser.add_argument("--style-prefix", help="Style instruction to prepend to text")
     parser.add_argument("--speed", "-s", type=float, help="Playback speed multiplier")
     parser.add_argument("--normalize", action="store_true", help="Apply volume normalization")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parallel Piper voice instances (each loads the model once)")
+    parser.add_argument("--cache-dir", help=f"Segment cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Always synthesize; don't read or write the segment cache")
 
     # Output options
     parser.add_argument("--json-out", help="Save metrics to JSON file")
 
     args = parser.parse_args()
 
-    # Check if Piper is available
-    if not have_piper():
+    voice = args.voice or os.getenv("PIPER_VOICE", str(Path.home() / "piper_models" / "en_US-amy-medium.onnx"))
+
+    # Check if Piper is available (binary, or onnxruntime + piper-phonemize in-process)
+    if not have_piper() and not onnx_available(voice):
         logger.warning("⚠️ Piper not found in PATH. Skipping synthesis gracefully.")
         logger.info("Install Piper: brew install piper")
         # Exit successfully to allow pipeline to continue
         return 0
 
     # Set defaults
-    voice = args.voice or os.getenv("PIPER_VOICE", str(Path.home() / "piper_models" / "en_US-amy-medium.onnx"))
     pause_short = args.pause_short if args.pause_short is not None else 0.25
     pause_medium = args.pause_medium if args.pause_medium is not None else 0.50
     pause_long = args.pause_long if args.pause_long is not None else 0.80
@@ -152,7 +177,7 @@ def main():
     # Apply style prefix if specified
     if args.style_prefix:
         text = apply_style_prefix(text, args.style_prefix)
-        logger.info(f"Applied style prefix: {args.style_prefix[:50]}...")
+        logger.info(f"Applied style prefix: {args.style_prefix[:50]}{'...' if len(args.style_prefix) > 50 else ''}")
 
     # Segment text using tts_common
     segments = segment_text(text, max_chars=max_chars, mode="sentence")
@@ -163,12 +188,50 @@ def main():
     logger.info(f"   Voice model: {voice_path.name}")
     logger.info(f"   Pauses: short={pause_short}s, medium={pause_medium}s, long={pause_long}s")
 
-    chunks: List[AudioSegment] = []
-    for i, seg in enumerate(segments, 1):
-        logger.info(f"   [{i}/{len(segments)}] Synthesizing: {seg[:60]}...")
-        audio = synthesize_with_piper(seg, str(voice_path))
-        chunks.append(audio)
-        logger.info(f"   [{i}/{len(segments)}] OK ({len(audio)}ms)")
+    # Segment cache: a re-exported or replaced voice model (new mtime/size) invalidates its entries
+    cache_dir = None if args.no_cache else Path(args.cache_dir or CACHE_DIR).expanduser().resolve()
+    st = voice_path.stat()
+    voice_key = ("piper", voice_path.resolve(), st.st_mtime_ns, st.st_size)
+    logger.info(f"   Cache: {cache_dir or 'off'}")
+
+    # A fixed pool of voice instances, each loading the model once; segments go to whichever is free
+    workers = max(1, min(args.workers, len(set(segments))))
+    threads = max(1, (os.cpu_count() or 2) // workers) if workers > 1 else 0
+    if workers > 1:
+        logger.info(f"   Workers: {workers} voice instances, {threads} threads each")
+
+    with ExitStack() as stack:
+        sessions = queue.Queue()
+        for _ in range(workers):
+            sessions.put(stack.enter_context(open_piper(str(voice_path), threads=threads)))
+
+        def produce(seg: str, path: Path) -> None:
+            session = sessions.get()
+            try:
+                session.synthesize_to(seg, path)
+            finally:
+                sessions.put(session)
+
+        # Cache hits never touch a voice instance
+        def synthesize(seg: str) -> AudioSegment:
+            return get_or_synth(cache_dir, voice_key + (seg,), "wav",
+                                produce=lambda path: produce(seg, path),
+                                decode=lambda path: AudioSegment.from_file(str(path), format="wav"))
+
+        # Repeated phrases are synthesized once and shared by every position
+        unique = list(dict.fromkeys(segments))
+        if len(unique) < len(segments):
+            logger.info(f"   {len(segments) - len(unique)} repeated segments reuse earlier audio")
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            audio = dict(zip(unique, tqdm(ex.map(synthesize, unique), total=len(unique),
+                                          desc="Piper", unit="seg")))
+        chunks: List[AudioSegment] = [audio[seg] for seg in segments]
+
+    # Keep the cache under its size cap (least recently used entries go first)
+    if cache_dir is not None:
+        logger.info(f"   Segment cache: {_CACHE_STATS['hits']} hits / {_CACHE_STATS['misses']} misses")
+        prune(cache_dir)
 
     # Build track using tts_common
     logger.info("Building final track with pauses and crossfades...")
@@ -187,12 +250,14 @@ def main():
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Export to WAV
+    # Export to WAV while the metrics pass (numpy, GIL released) runs alongside
     logger.info("Exporting to WAV...")
-    track.export(str(output_path), format="wav")
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        pending_metrics = ex.submit(measure, track)
+        export_track(track, output_path, "wav")
+        metrics = pending_metrics.result()
 
-    # Measure and log metrics
-    metrics = measure(track)
+    # Log metrics
     file_size_mb = output_path.stat().st_size / (1024 * 1024)
 
     logger.success(f"✅ Audio generated: {output_path}")
@@ -215,8 +280,7 @@ def main():
             "speed": speed
         }
 
-        with open(json_path, 'w') as f:
-            json.dump(metrics_full, f, indent=2)
+        json_path.write_bytes(dump_metrics(metrics_full))
 
         logger.info(f"   Metrics saved to: {json_path}")
 
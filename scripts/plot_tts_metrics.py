@@ -3,22 +3,30 @@
 """
 Plot TTS Comparison Metrics - Visualize CSV reports
 Converts CSV reports from compare_report_to_md.py into PNG charts
-- No pandas. Uses csv + matplotlib only.
+- No pandas. Uses csv + numpy/matplotlib only.
 - Saves PNGs under output/reports/plots/
 """
 import os
+import io
 import csv
 import argparse
 import pathlib
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
+import numpy as np
 import matplotlib
 matplotlib.use("Agg")  # headless mode for CI/server
+# Simplify long paths and stroke them in chunks (large trend plots)
+matplotlib.rcParams["path.simplify"] = True
+matplotlib.rcParams["path.simplify_threshold"] = 1.0
+matplotlib.rcParams["agg.path.chunksize"] = 10000
 import matplotlib.pyplot as plt
 
 
-def parse_args():
-    """Parse command-line arguments"""
+def parse_args(argv=None):
+    """Parse command-line arguments (sys.argv[1:] when argv is None)"""
     ap = argparse.ArgumentParser(
         description="Plot TTS metrics from CSV reports."
     )
@@ -32,22 +40,58 @@ def parse_args():
                     help="Limit number of rows (after sort)")
     ap.add_argument("--title-suffix", default="",
                     help="Extra title suffix for charts")
-    return ap.parse_args()
+    return ap.parse_args(argv)
 
 
-def load_rows(csv_paths):
-    """Load all rows from CSV files"""
-    rows = []
-    for p in csv_paths:
+# Numeric columns read from the report CSVs (see compare_report_to_md.FIELDS)
+METRICS = (
+    "openai_rms", "piper_rms",
+    "openai_duration", "piper_duration",
+    "openai_silence_pct", "piper_silence_pct",
+)
+
+
+def _read(p):
+    """File text for one CSV, or the exception raised while reading it"""
+    try:
+        with open(p, newline="", encoding="utf-8") as fp:
+            return fp.read()
+    except Exception as e:
+        return e
+
+
+def load_rows(csv_paths, workers=16):
+    """
+    Load all rows from CSV files, column-major: {"_source": [...], "slug": [...], metric: [raw cells]}
+
+    Files are read concurrently (file I/O releases the GIL), then parsed
+    serially in csv_paths order.
+    """
+    texts = []
+    if csv_paths:
+        with ThreadPoolExecutor(max_workers=min(workers, len(csv_paths))) as ex:
+            texts = list(ex.map(_read, csv_paths))
+
+    data = {k: [] for k in ("_source", "slug", *METRICS)}
+    for p, text in zip(csv_paths, texts):
         try:
-            with open(p, newline="", encoding="utf-8") as fp:
-                rdr = csv.DictReader(fp)
-                for r in rdr:
-                    r["_source"] = p
-                    rows.append(r)
+            if isinstance(text, Exception):
+                raise text
+            rdr = csv.reader(io.StringIO(text, newline=""))
+            header = next(rdr, [])
+            # Column positions looked up once per file (-1: column absent)
+            idx = [header.index(k) if k in header else -1 for k in ("slug", *METRICS)]
+            for rec in rdr:
+                if not rec:
+                    continue  # blank line
+                cells = [rec[i] if 0 <= i < len(rec) else None for i in idx]
+                data["_source"].append(p)
+                data["slug"].append(cells[0] or "")
+                for k, v in zip(METRICS, cells[1:]):
+                    data[k].append(v)
         except Exception as e:
             print(f"[skip] {p}: {e}")
-    return rows
+    return data
 
 
 def to_float(x):
@@ -60,27 +104,48 @@ def to_float(x):
         return None
 
 
-def sort_key(row):
-    """Sort key: timestamp from filename → slug"""
-    # Extract timestamp from filename: tts_compare_20251011_220027.csv
-    m = re.search(r"tts_compare_(\d{8}_\d{6})", row.get("_source", ""))
-    ts = m.group(1) if m else ""
-    return (ts, row.get("slug", ""))
+def column(data, key):
+    """One CSV column as a float array, NaN where the cell is missing or not a number"""
+    cells = data[key]
+    nan = float("nan")
+    try:
+        # Fast path: every cell is a number or empty (no try per cell)
+        return np.array([float(x) if x else nan for x in cells], dtype=float)
+    except ValueError:
+        return np.array([to_float(x) for x in cells], dtype=float)
+
+
+def source_stamp(path):
+    """Timestamp from a report filename: tts_compare_20251011_220027.csv → 20251011_220027"""
+    m = re.search(r"tts_compare_(\d{8}_\d{6})", path)
+    return m.group(1) if m else ""
 
 
 def rolling_mean(seq, w):
-    """Calculate rolling mean with window size w"""
+    """Calculate rolling mean with window size w (None/NaN values are skipped)"""
     if w <= 1:
         return seq[:]
 
+    # Running sum/count: add the new value, subtract the one leaving the window
     out = []
-    buf = []
+    buf = deque(maxlen=w)
+    total = 0.0
+    count = 0
     for v in seq:
+        if v is not None and v != v:
+            v = None  # NaN
+        if len(buf) == w:
+            old = buf[0]
+            if old is not None:
+                total -= old
+                count -= 1
+                if not count:
+                    total = 0.0  # drop accumulated rounding once the window holds no values
         buf.append(v)
-        if len(buf) > w:
-            buf.pop(0)
-        valid = [x for x in buf if x is not None]
-        out.append(sum(valid) / len(valid) if valid else None)
+        if v is not None:
+            total += v
+            count += 1
+        out.append(total / count if count else None)
     return out
 
 
@@ -91,107 +156,123 @@ def ensure_outdir(p):
     return p
 
 
-def plot_trend(x_idx, y1, y2, labels, title, outpath, rolling=0):
+def new_axes(fig, size):
+    """Clear the shared figure, resize it and give it one fresh Axes"""
+    fig.clf()
+    fig.set_size_inches(*size)
+    return fig.add_subplot(111)
+
+
+def plot_trend(fig, x_idx, y1, y2, labels, title, outpath, rolling=0):
     """Plot trend line chart"""
     xi = list(range(len(x_idx)))
-    plt.figure(figsize=(12, 6))
+    ax = new_axes(fig, (12, 6))
+
+    # Markers dominate draw time on dense plots; plain lines past 200 runs
+    dense = len(xi) > 200
 
     # Apply rolling mean if requested
     y1p = rolling_mean(y1, rolling) if rolling > 1 else y1
-    plt.plot(xi, y1p, label=labels[0], marker='o', markersize=4)
+    ax.plot(xi, y1p, label=labels[0], marker=None if dense else 'o', markersize=4)
 
     # Plot second series if available
-    if any(v is not None for v in y2):
+    if np.isfinite(y2).any():
         y2p = rolling_mean(y2, rolling) if rolling > 1 else y2
-        plt.plot(xi, y2p, label=labels[1], marker='s', markersize=4)
+        ax.plot(xi, y2p, label=labels[1], marker=None if dense else 's', markersize=4)
 
-    plt.xticks(xi, x_idx, rotation=45, ha="right", fontsize=8)
-    plt.legend()
-    plt.title(title)
-    plt.ylabel("RMS (dBFS)")
-    plt.xlabel("Comparison Run")
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(outpath, dpi=100)
-    plt.close()
+    ax.set_xticks(xi)
+    ax.set_xticklabels(x_idx, rotation=45, ha="right", fontsize=8)
+    ax.legend()
+    ax.set_title(title)
+    ax.set_ylabel("RMS (dBFS)")
+    ax.set_xlabel("Comparison Run")
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(outpath, dpi=100)
 
 
-def plot_scatter(x, y, title, outpath):
+def plot_scatter(fig, x, y, title, outpath):
     """Plot scatter plot with y=x reference line"""
-    xs = [a for a, b in zip(x, y) if a is not None and b is not None]
-    ys = [b for a, b in zip(x, y) if a is not None and b is not None]
+    both = np.isfinite(x) & np.isfinite(y)
+    xs, ys = x[both], y[both]
 
-    plt.figure(figsize=(8, 8))
-    plt.scatter(xs, ys, s=30, alpha=0.6)
+    ax = new_axes(fig, (8, 8))
+    ax.scatter(xs, ys, s=30, alpha=0.6)
 
     # Add y=x reference line
-    if xs and ys:
-        lo = min(min(xs), min(ys))
-        hi = max(max(xs), max(ys))
-        plt.plot([lo, hi], [lo, hi], 'r--', alpha=0.5, label='y=x')
-        plt.legend()
-
-    plt.xlabel("OpenAI duration (sec)")
-    plt.ylabel("Piper duration (sec)")
-    plt.title(title)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(outpath, dpi=100)
-    plt.close()
-
-
-def plot_hist(data, title, outpath, bins=20):
+    if xs.size:
+        lo = float(min(xs.min(), ys.min()))
+        hi = float(max(xs.max(), ys.max()))
+        ax.plot([lo, hi], [lo, hi], 'r--', alpha=0.5, label='y=x')
+        ax.legend()
+
+    ax.set_xlabel("OpenAI duration (sec)")
+    ax.set_ylabel("Piper duration (sec)")
+    ax.set_title(title)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(outpath, dpi=100)
+
+
+def plot_hist(fig, data, title, outpath, bins=20):
     """Plot histogram"""
-    v = [d for d in data if d is not None]
+    v = data[np.isfinite(data)]
 
-    if not v:
+    if not v.size:
         print(f"[skip] {title}: no data")
         return
 
-    plt.figure(figsize=(10, 6))
-    plt.hist(v, bins=bins, edgecolor='black', alpha=0.7)
-    plt.title(title)
-    plt.xlabel("Silence Ratio (%)")
-    plt.ylabel("Frequency")
-    plt.grid(True, alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(outpath, dpi=100)
-    plt.close()
+    ax = new_axes(fig, (10, 6))
+    ax.hist(v, bins=bins, edgecolor='black', alpha=0.7)
+    ax.set_title(title)
+    ax.set_xlabel("Silence Ratio (%)")
+    ax.set_ylabel("Frequency")
+    ax.grid(True, alpha=0.3, axis='y')
+    fig.tight_layout()
+    fig.savefig(outpath, dpi=100)
 
 
-def main():
-    """Main execution"""
-    args = parse_args()
+def main(argv=None):
+    """Main execution; argv lets callers (tests) run it in-process"""
+    args = parse_args(argv)
     outdir = ensure_outdir(args.outdir)
 
     # Load CSV files
     csv_paths = sorted(glob(args.csv_glob))
-    rows = load_rows(csv_paths)
+    data = load_rows(csv_paths)
 
-    if not rows:
+    if not data["slug"]:
         print("No CSV rows found. Make sure to run compare_report_to_md.py first.")
         return 0
 
-    # Sort and limit
-    rows.sort(key=sort_key)
+    # Sort (timestamp from filename → slug, stable) and limit
+    stamp = {p: source_stamp(p) for p in csv_paths}
+    order = np.lexsort((
+        np.array(data["slug"]),
+        np.array([stamp[p] for p in data["_source"]]),
+    ))
     if args.limit > 0:
-        rows = rows[-args.limit:]
+        order = order[-args.limit:]
 
     # Extract data
-    x_idx = [r.get("slug", "") for r in rows]
-    oa_rms = [to_float(r.get("openai_rms")) for r in rows]
-    pp_rms = [to_float(r.get("piper_rms")) for r in rows]
-    oa_dur = [to_float(r.get("openai_duration")) for r in rows]
-    pp_dur = [to_float(r.get("piper_duration")) for r in rows]
-    oa_sil = [to_float(r.get("openai_silence_pct")) for r in rows]
-    pp_sil = [to_float(r.get("piper_silence_pct")) for r in rows]
+    x_idx = [data["slug"][i] for i in order]
+    oa_rms = column(data, "openai_rms")[order]
+    pp_rms = column(data, "piper_rms")[order]
+    oa_dur = column(data, "openai_duration")[order]
+    pp_dur = column(data, "piper_duration")[order]
+    oa_sil = column(data, "openai_silence_pct")[order]
+    pp_sil = column(data, "piper_silence_pct")[order]
+    has_piper_sil = np.isfinite(pp_sil).any()
 
     suf = f" {args.title_suffix}" if args.title_suffix else ""
 
+    # One figure (canvas + renderer) reused for every chart, cleared in between
+    fig = plt.figure()
+
     # 1) RMS Trend
     print("Generating RMS trend plot...")
     plot_trend(
-        x_idx, oa_rms, pp_rms,
+        fig, x_idx, oa_rms, pp_rms,
         labels=("OpenAI RMS (dBFS)", "Piper RMS (dBFS)"),
         title=f"TTS RMS Trend{suf}",
         outpath=outdir / "rms_trend.png",
@@ -201,7 +282,7 @@ def main():
     # 2) Duration Scatter
     print("Generating duration scatter plot...")
     plot_scatter(
-        oa_dur, pp_dur,
+        fig, oa_dur, pp_dur,
         title=f"Duration: OpenAI vs Piper (y=x){suf}",
         outpath=outdir / "duration_scatter.png"
     )
@@ -209,23 +290,25 @@ def main():
     # 3) Silence Histograms
     print("Generating silence histograms...")
     plot_hist(
-        oa_sil,
+        fig, oa_sil,
         title=f"OpenAI Silence % Histogram{suf}",
         outpath=outdir / "openai_silence_hist.png"
     )
 
-    if any(v is not None for v in pp_sil):
+    if has_piper_sil:
         plot_hist(
-            pp_sil,
+            fig, pp_sil,
             title=f"Piper Silence % Histogram{suf}",
             outpath=outdir / "piper_silence_hist.png"
         )
 
+    plt.close(fig)
+
     print(f"✅ Plots saved to: {outdir}")
     print(f"   - rms_trend.png")
     print(f"   - duration_scatter.png")
     print(f"   - openai_silence_hist.png")
-    if any(v is not None for v in pp_sil):
+    if has_piper_sil:
         print(f"   - piper_silence_hist.png")
 
     return 0
@@ -8,11 +8,17 @@ Generate manifest.jsonl with sentence-level chunking and pause metadata
 import sys
 import os
 import argparse
-import json
+import orjson
 import yaml
 import logging
 from pathlib import Path
 
+# libyaml C parser when PyYAML was built against it, pure-Python otherwise
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 # Add utils to path
 sys.path.insert(0, str(Path(__file__).parent))
 from utils.textseg import segment_text
@@ -56,8 +62,7 @@ def main():
         print(f"Error: Config file not found: {config_path}")
         return 1
 
-    with open(config_path, "r") as f:
-        cfg = yaml.safe_load(f)
+    cfg = yaml.load(config_path.read_bytes(), Loader=_YamlLoader)
 
     # Validate pause settings
     pause_cfg = cfg.get("tts", {}).get("pause", {})
@@ -102,23 +107,18 @@ def main():
 
     # Count pause types
     pause_counts = {'short': 0, 'medium': 0, 'long': 0, 'none': 0}
-    paragraph_count = 0
+    for _, pause_type in segments:
+        pause_counts[pause_type] += 1
+    paragraph_count = pause_counts['long']
+
+    # One JSON line per chunk, serialized to UTF-8 bytes and written in one go
+    payload = b"".join(
+        orjson.dumps({"idx": idx, "text": chunk_text, "pause_after": pause_type}) + b"\n"
+        for idx, (chunk_text, pause_type) in enumerate(segments, 1)
+    )
 
     try:
-        with open(manifest_path, "w", encoding="utf-8") as f:
-            for idx, (chunk_text, pause_type) in enumerate(segments, 1):
-                entry = {
-                    "idx": idx,
-                    "text": chunk_text,
-                    "pause_after": pause_type
-                }
-                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-
-                # Count
-                pause_counts[pause_type] += 1
-                if pause_type == 'long':
-                    paragraph_count += 1
-
+        manifest_path.write_bytes(payload)
     except Exception as e:
         logging.error(f"Failed to write manifest: {e}")
         print(f"Error: Failed to write manifest: {e}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Pipeline Runner - async task graph over the numbered pipeline scripts
+Each stage starts as soon as its inputs exist; independent branches run concurrently:
+  01 prepare -> 02 translate -> 03 edit -> 04 TTS -> 05 video -> (WordPress || YouTube)
+Multiple input files run as independent pipelines side by side.
+"""
+
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+from typing import List
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).parent))
+from _cfg import load_cfg, publish_target
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / "scripts"
+
+
+async def stage(script: str, *args: str) -> str:
+    """Run one pipeline script from the project root and return its stdout (stripped)"""
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(SCRIPTS / script), *args,
+        cwd=ROOT, stdout=asyncio.subprocess.PIPE
+    )
+    out, _ = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{script} {' '.join(args)} failed with exit code {proc.returncode}")
+    return out.decode("utf-8").strip()
+
+
+async def run_one(input_file: Path, publish: List[str]) -> str:
+    """Drive a single input through all stages, then each enabled publish target; returns its slug"""
+    slug = (await stage("01_prepare.py", str(input_file))).splitlines()[-1]
+    logger.info(f"[{slug}] prepared")
+
+    await stage("02_translate.py", slug)
+    title = (await stage("03_edit_en.py", slug)).splitlines()[-1]
+    logger.info(f"[{slug}] title: {title}")
+
+    await stage("04_tts.py", slug)
+    await stage("05_video.py", slug, "--title-text", title)
+    logger.success(f"[{slug}] video ready")
+
+    if publish:
+        await asyncio.gather(*(stage("06_publish.py", target, slug) for target in publish))
+    return slug
+
+
+async def run_all(inputs, publish: List[str]) -> int:
+    results = await asyncio.gather(*(run_one(p, publish) for p in inputs), return_exceptions=True)
+    failed = 0
+    for p, res in zip(inputs, results):
+        if isinstance(res, Exception):
+            logger.error(f"❌ {p}: {res}")
+            failed += 1
+        else:
+            logger.success(f"✅ {p} -> output/{res}/")
+    return 1 if failed else 0
+
+
+def main():
+    """CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline as an async task graph (one or more input files)"
+    )
+    parser.add_argument("inputs", nargs="+", help="Korean input text files")
+    parser.add_argument("--publish", action="store_true",
+                        help="Publish to WordPress and YouTube after the video is built")
+    args = parser.parse_args()
+
+    inputs = [Path(p).resolve() for p in args.inputs]
+    missing = [p for p in inputs if not p.exists()]
+    if missing:
+        for p in missing:
+            logger.error(f"Input file not found: {p}")
+        return 1
+
+    # Only targets enabled in config.yaml; disabled ones are skipped, not failed
+    targets = []
+    if args.publish:
+        cfg = load_cfg(ROOT / "config.yaml")
+        for name in ("wordpress", "youtube"):
+            if publish_target(cfg, name) is not None:
+                targets.append(name)
+            else:
+                logger.warning(f"Publish target '{name}' disabled in config.yaml - skipping")
+
+    return asyncio.run(run_all(inputs, targets))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
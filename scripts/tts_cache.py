@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+TTS Cache - Content-addressed on-disk cache of synthesized segments
+Shared by OpenAI TTS and Piper TTS: a segment is keyed by the sha256 of everything
+that changes its audio, so reruns that only touch post-processing skip synthesis.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Sequence, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+# $XDG_CACHE_HOME/yt-auto/tts, ~/.cache when unset
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "yt-auto" / "tts"
+
+# Size cap for prune(): least recently used entries go first
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Lookups against a cache_dir this process made; each engine logs them before prune() (never reset here)
+_CACHE_STATS = {"hits": 0, "misses": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(stat: str) -> None:
+    with _STATS_LOCK:
+        _CACHE_STATS[stat] += 1
+
+
+def cache_path(cache_dir: Path, key_parts: Sequence, ext: str) -> Path:
+    """Cache file for one segment: sha256 of the '|'-joined key parts"""
+    key = hashlib.sha256("|".join(str(p) for p in key_parts).encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"{key}.{ext}"
+
+
+def get_or_synth(cache_dir: Optional[Path], key_parts: Sequence, ext: str,
+                 produce: Callable[[Path], None], decode: Callable[[Path], T]) -> T:
+    """
+    Decode the cached file for key_parts, or produce it, decode it and cache it
+
+    Args:
+        cache_dir: Cache directory, or None to always produce (nothing is kept)
+        key_parts: Everything that changes the output (text, voice, model, format, ...)
+        ext: File extension of the cached audio
+        produce: Writes the audio file to the given path
+        decode: Reads an audio file into the caller's type
+
+    Errors from produce/decode propagate; only audio that decoded is cached,
+    and write-then-rename means parallel writers never expose partial files.
+    A hit refreshes the entry's mtime, which prune() reads as last use.
+    """
+    path = None
+    if cache_dir is not None:
+        path = cache_path(cache_dir, key_parts, ext)
+        if path.exists():
+            try:
+                result = decode(path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache entry {path.name}: {e}")
+            else:
+                _count("hits")
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass  # evicted meanwhile; the decoded audio is still good
+                return result
+
+        _count("misses")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    else:
+        fd, name = tempfile.mkstemp(suffix=f".{ext}")
+        os.close(fd)
+        tmp = Path(name)
+
+    try:
+        produce(tmp)
+        result = decode(tmp)
+        if path is not None:
+            os.replace(tmp, path)
+        return result
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def prune(cache_dir: Path, max_bytes: int = CACHE_MAX_BYTES) -> int:
+    """
+    Delete least recently used entries until cache_dir holds at most max_bytes
+
+    Returns the number of files removed. In-flight temp files are left alone.
+    """
+    entries = []
+    total = 0
+    try:
+        with os.scandir(cache_dir) as it:
+            for e in it:
+                if e.name.endswith(".tmp") or not e.is_file():
+                    continue
+                st = e.stat()
+                entries.append((st.st_mtime_ns, st.st_size, e.path))
+                total += st.st_size
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"Pruned {removed} cache entries from {cache_dir}")
+    return removed
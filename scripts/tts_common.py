@@ -8,14 +8,31 @@ Used by both OpenAI TTS and Piper TTS for consistent results
 
 import re
 import math
-from typing import List, Tuple, Dict
+import subprocess
+from fractions import Fraction
+from typing import Iterable, Iterator, List, Tuple, Dict
+import numpy as np
+import orjson
 from pydub import AudioSegment
-from pydub.silence import detect_silence
+from pydub.utils import db_to_float, ratio_to_db
+
+# Optional: polyphase resampler (anti-aliased) for speed changes; linear interpolation otherwise
+try:
+    from scipy.signal import resample_poly
+except ImportError:
+    resample_poly = None
 
 
 # Text segmentation patterns
 PARA_SPLIT = re.compile(r'\n\s*\n')  # Double newline
 SENT_END = re.compile(r'([\.!?。．]+[)\"\'\u00BB]*)(\s+)')  # Sentence endings
+# Whole sentences in one scan: text up to the first SENT_END, or the unterminated remainder.
+# Runs of non-terminators / terminators not followed by whitespace are matched atomically
+# via (?=(X+))\N (possessive ++ needs Python 3.11; CI and README target 3.10+).
+SENTENCE = re.compile(
+    r'((?:(?=([^\.!?。．]+))\2|(?=([\.!?。．]+))\3(?![)\"\'\u00BB]*\s))*[\.!?。．]+[)\"\'\u00BB]*)\s+|(.+)',
+    re.DOTALL
+)
 CLAUSE_SPLIT = re.compile(r'([,;:\u2014\u2013])')  # Clause markers
 
 
@@ -47,68 +64,91 @@ def segment_text(
     paragraphs = [p.strip() for p in PARA_SPLIT.split(full_text.strip()) if p.strip()]
 
     for para in paragraphs:
-        # Split paragraph into sentences
-        sentences = _split_sentences(para)
-
-        if mode == "paragraph":
-            # Keep whole paragraph if under limit
-            if len(para) <= max_chars:
-                segments.append(para)
-                continue
-
-        # Combine sentences until max_chars
-        current_segment = []
-        current_length = 0
-
-        for sent in sentences:
-            sent_len = len(sent)
-
-            # If single sentence exceeds max_chars, split it further
-            if sent_len > max_chars:
-                if current_segment:
-                    segments.append(' '.join(current_segment))
-                    current_segment = []
-                    current_length = 0
-
-                # Split long sentence by clause markers
-                clauses = _split_by_clauses(sent, max_chars)
-                segments.extend(clauses)
-                continue
-
-            # Add sentence to current segment if it fits
-            if current_length + sent_len + 1 <= max_chars:
-                current_segment.append(sent)
-                current_length += sent_len + (1 if current_segment else 0)
-            else:
-                # Flush current segment and start new one
-                if current_segment:
-                    segments.append(' '.join(current_segment))
-                current_segment = [sent]
-                current_length = sent_len
-
-        # Flush remaining sentences
-        if current_segment:
-            segments.append(' '.join(current_segment))
+        segments.extend(_segment_paragraph(para, max_chars, mode))
 
     return segments
 
 
-def _split_sentences(paragraph: str) -> List[str]:
-    """Split paragraph into sentences"""
-    sentences = []
-    parts = SENT_END.split(paragraph)
-
-    i = 0
-    while i < len(parts):
-        if i + 2 < len(parts) and parts[i+1]:  # Has end marker and space
-            sentences.append((parts[i] + parts[i+1]).strip())
-            i += 3  # Skip text, end marker, space
-        elif parts[i].strip():
-            sentences.append(parts[i].strip())
-            i += 1
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Stripped paragraphs (separated by blank lines) from lines, e.g. an open text file"""
+    current = []
+    for line in lines:
+        if line.strip():
+            current.append(line)
+        elif current:
+            yield ''.join(current).strip()
+            current = []
+    if current:
+        yield ''.join(current).strip()
+
+
+def iter_segments(
+    lines: Iterable[str],
+    max_chars: int = 800,
+    mode: str = "sentence"
+) -> Iterator[str]:
+    """
+    Same segments as segment_text, produced lazily from lines of text
+
+    Each paragraph is segmented as soon as its closing blank line is read, so
+    callers can start synthesis before the rest of the input is read.
+    """
+    for para in iter_paragraphs(lines):
+        yield from _segment_paragraph(para, max_chars, mode)
+
+
+def _segment_paragraph(para: str, max_chars: int, mode: str) -> List[str]:
+    """Segments for one stripped, non-empty paragraph"""
+    if mode == "paragraph":
+        # Keep whole paragraph if under limit
+        if len(para) <= max_chars:
+            return [para]
+
+    segments = []
+
+    # Split paragraph into sentences (only when it has to be broken up)
+    sentences = _split_sentences(para)
+
+    # Combine sentences until max_chars
+    current_segment = []
+    current_length = 0
+
+    for sent in sentences:
+        sent_len = len(sent)
+
+        # If single sentence exceeds max_chars, split it further
+        if sent_len > max_chars:
+            if current_segment:
+                segments.append(' '.join(current_segment))
+                current_segment = []
+                current_length = 0
+
+            # Split long sentence by clause markers
+            clauses = _split_by_clauses(sent, max_chars)
+            segments.extend(clauses)
+            continue
+
+        # Add sentence to current segment if it fits
+        if current_length + sent_len + 1 <= max_chars:
+            current_segment.append(sent)
+            current_length += sent_len + (1 if current_segment else 0)
         else:
-            i += 1
+            # Flush current segment and start new one
+            if current_segment:
+                segments.append(' '.join(current_segment))
+            current_segment = [sent]
+            current_length = sent_len
+
+    # Flush remaining sentences
+    if current_segment:
+        segments.append(' '.join(current_segment))
+
+    return segments
+
 
+def _split_sentences(paragraph: str) -> List[str]:
+    """Split paragraph into sentences"""
+    sentences = ((m.group(1) or m.group(4)).strip() for m in SENTENCE.finditer(paragraph))
     return [s for s in sentences if s]
 
 
@@ -136,6 +176,160 @@ def _split_by_clauses(sentence: str, max_chars: int) -> List[str]:
     return clauses
 
 
+# pydub sample width (bytes) -> numpy sample type
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def common_format(chunks: List[AudioSegment]) -> List[AudioSegment]:
+    """Bring chunks to one frame rate / channel count / sample width, as pydub's `+` would"""
+    frame_rate = max(c.frame_rate for c in chunks)
+    channels = max(c.channels for c in chunks)
+    width = max(c.sample_width for c in chunks)
+    return [c.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(width)
+            for c in chunks]
+
+
+def concat_with_pauses(chunks: List[AudioSegment], pause_ms: int) -> AudioSegment:
+    """
+    Join chunks with pause_ms of silence between them in a single allocation
+
+    One b"".join copies each sample exactly once, instead of re-copying the
+    whole track on every AudioSegment `+` (quadratic in the number of chunks).
+    """
+    chunks = common_format(chunks)
+    first = chunks[0]
+
+    silence = b"\0" * (int(first.frame_rate * pause_ms / 1000) * first.frame_width)
+    parts = []
+    for i, chunk in enumerate(chunks):
+        if i > 0:
+            parts.append(silence)
+        parts.append(chunk.raw_data)
+
+    return first._spawn(b"".join(parts))
+
+
+def concat_with_crossfade(chunks: List[AudioSegment], crossfade_ms: int,
+                          pause_ms: int) -> AudioSegment:
+    """
+    Join chunks, overlapping each one with the end of the track by crossfade_ms
+
+    Same layout as chaining AudioSegment.append(crossfade=...): linear fade-out /
+    fade-in over the overlap, and a chunk that follows a track still shorter than
+    the crossfade gets pause_ms of silence instead. The output is allocated once
+    and only the overlaps are mixed, in place.
+    """
+    chunks = common_format(chunks)
+    first = chunks[0]
+    channels = first.channels
+    dtype = SAMPLE_DTYPES[first.sample_width]
+    info = np.iinfo(dtype)
+
+    xf = int(first.frame_rate * crossfade_ms / 1000)
+    gap = int(first.frame_rate * pause_ms / 1000)
+    arrays = [np.frombuffer(c.raw_data, dtype=dtype).reshape(-1, channels) for c in chunks]
+
+    # Layout pass: where each chunk starts and how much of it overlaps the track
+    layout = []
+    end = 0
+    for i, a in enumerate(arrays):
+        if i > 0 and end > xf:
+            overlap = min(xf, len(a))
+            start = end - overlap
+        else:
+            overlap = 0
+            start = end + gap if i > 0 else 0
+        layout.append((start, overlap))
+        end = start + len(a)
+
+    buf = np.zeros((end, channels), dtype=dtype)
+    for a, (start, overlap) in zip(arrays, layout):
+        if overlap:
+            ramp = (np.arange(overlap) / overlap)[:, None]
+            mixed = buf[start:start + overlap] * (1.0 - ramp) + a[:overlap] * ramp
+            buf[start:start + overlap] = np.clip(mixed, info.min, info.max)
+        buf[start + overlap:start + len(a)] = a[overlap:]
+
+    return first._spawn(buf.tobytes())
+
+
+def fade_chunk(chunk: AudioSegment, fade_ms: int) -> AudioSegment:
+    """
+    Linear fade-in and fade-out of fade_ms, as chunk.fade_in(fade_ms).fade_out(fade_ms)
+
+    Same gain ramps (from/to -120 dB) applied with one multiply per end of the
+    sample array, instead of pydub's audioop call per sample. Every sample is
+    kept: pydub's millisecond slicing can drop or pad a fraction of a ms.
+    """
+    dtype = SAMPLE_DTYPES[chunk.sample_width]
+    info = np.iinfo(dtype)
+    x = np.frombuffer(chunk.raw_data, dtype=dtype).reshape(-1, chunk.channels)
+
+    fade_frames = fade_ms * (chunk.frame_rate / 1000.0)
+    n = min(int(fade_frames), len(x))
+    if n <= 0:
+        return chunk
+
+    floor_gain = db_to_float(-120)
+    steps = (1.0 - floor_gain) * np.arange(n) / fade_frames
+    y = x.astype(np.float64)
+    y[:n] = np.floor(y[:n] * (floor_gain + steps)[:, None])
+    y[-n:] = np.floor(y[-n:] * (1.0 - steps)[:, None])
+    return chunk._spawn(np.clip(y, info.min, info.max).astype(dtype).tobytes())
+
+
+def _resample(x: np.ndarray, speed: float) -> np.ndarray:
+    """Float samples (frames x channels) played `speed` times faster at the same frame rate"""
+    if resample_poly is not None:
+        ratio = Fraction(speed).limit_denominator(1000)
+        return resample_poly(x.astype(np.float32), ratio.denominator, ratio.numerator, axis=0)
+
+    pos = np.arange(int(len(x) / speed)) * speed
+    frames = np.arange(len(x))
+    return np.stack([np.interp(pos, frames, x[:, c]) for c in range(x.shape[1])], axis=1)
+
+
+def change_speed(track: AudioSegment, speed: float) -> AudioSegment:
+    """
+    Play track `speed` times faster at the same frame rate (pitch follows, like a tape)
+
+    Resamples the int samples in numpy (scipy's resample_poly when installed,
+    np.interp otherwise) instead of retagging the frame rate and converting
+    back through audioop.
+    """
+    return finish_track(track, speed=speed)
+
+
+def finish_track(track: AudioSegment, speed: float = 1.0, normalize: bool = False,
+                 headroom: float = 0.1) -> AudioSegment:
+    """
+    change_speed(track, speed) followed by track.normalize(headroom), in one pass
+
+    The samples go to float once: resample, round, then scale to the peak target
+    with audioop.mul's floor rounding, and come back as ints once, instead of
+    a full int buffer per step.
+    """
+    change = abs(speed - 1.0) > 0.001
+    if not change and not normalize:
+        return track
+
+    dtype = SAMPLE_DTYPES[track.sample_width]
+    info = np.iinfo(dtype)
+    x = np.frombuffer(track.raw_data, dtype=dtype).reshape(-1, track.channels)
+
+    y = np.clip(np.rint(_resample(x, speed)), info.min, info.max) if change else x.astype(np.float64)
+
+    if normalize:
+        # pydub.effects.normalize: silent audio is left as is
+        peak = float(np.abs(y).max()) if y.size else 0.0
+        if peak:
+            target = track.max_possible_amplitude * db_to_float(-headroom)
+            gain = db_to_float(ratio_to_db(target / peak))
+            y = np.clip(np.floor(y * gain), info.min, info.max)
+
+    return track._spawn(y.astype(dtype).tobytes())
+
+
 def build_track(
     chunks: List[AudioSegment],
     pause_short: float = 0.25,
@@ -165,43 +359,114 @@ def build_track(
     if not chunks:
         return AudioSegment.silent(duration=0)
 
-    # Start with silent track
-    track = AudioSegment.silent(duration=0)
+    # Fade each chunk, then lay chunks + pauses (or crossfades) into a single buffer
+    if fade_ms > 0:
+        chunks = [fade_chunk(chunk, fade_ms) for chunk in chunks]
 
-    for i, chunk in enumerate(chunks):
-        # Apply fade in/out to each chunk
-        if fade_ms > 0:
-            chunk = chunk.fade_in(fade_ms).fade_out(fade_ms)
+    pause_ms = int(pause_medium * 1000)
+    if crossfade_ms <= 0:
+        track = concat_with_pauses(chunks, pause_ms)
+    else:
+        track = concat_with_crossfade(chunks, crossfade_ms, pause_ms)
+
+    # Speed adjustment and normalization share one pass over the samples
+    if abs(speed - 1.0) > 0.05:
+        print(f"⚠️  Speed {speed} is outside recommended range (0.95-1.05)")
+
+    return finish_track(track, speed=speed, normalize=normalize)
 
-        if i == 0:
-            # First chunk - just add it
-            track = chunk
-        else:
-            # Add pause before this chunk (medium pause by default)
-            pause_duration = int(pause_medium * 1000)
-
-            if crossfade_ms > 0 and len(track) > crossfade_ms:
-                # Crossfade with previous chunk
-                track = track.append(chunk, crossfade=crossfade_ms)
-            else:
-                # Simple concatenation with pause
-                track = track + AudioSegment.silent(duration=pause_duration) + chunk
-
-    # Apply speed adjustment if needed
-    if abs(speed - 1.0) > 0.001:
-        if abs(speed - 1.0) > 0.05:
-            print(f"⚠️  Speed {speed} is outside recommended range (0.95-1.05)")
-
-        new_frame_rate = int(track.frame_rate / speed)
-        track = track._spawn(track.raw_data, overrides={
-            "frame_rate": new_frame_rate
-        }).set_frame_rate(track.frame_rate)
-
-    # Apply normalization
-    if normalize:
-        track = track.normalize(headroom=0.1)
 
-    return track
+# Compressed output formats: ffmpeg muxer + encoder options
+FFMPEG_ENCODERS = {
+    "mp3": ["-f", "mp3", "-c:a", "libmp3lame", "-q:a", "2"],
+    "aac": ["-f", "adts", "-c:a", "aac", "-b:a", "160k"],
+    "opus": ["-f", "ogg", "-c:a", "libopus", "-b:a", "64k"],
+    "flac": ["-f", "flac", "-c:a", "flac"],
+}
+
+# pydub sample width (bytes) -> ffmpeg raw input format
+FFMPEG_SAMPLE_FORMATS = {1: "s8", 2: "s16le", 4: "s32le"}
+
+
+def export_track(track: AudioSegment, path, fmt: str) -> None:
+    """
+    Write track to path as wav, pcm (headerless samples) or a compressed format
+
+    wav/pcm are written by pydub without ffmpeg. Compressed formats pipe the raw
+    samples straight into one ffmpeg encode (all threads), skipping the temporary
+    WAV file pydub's export writes and re-reads.
+    """
+    if fmt in ("wav", "pcm"):
+        track.export(str(path), format="raw" if fmt == "pcm" else "wav").close()
+        return
+
+    cmd = [
+        AudioSegment.converter, "-y", "-loglevel", "error",
+        "-f", FFMPEG_SAMPLE_FORMATS[track.sample_width],
+        "-ar", str(track.frame_rate), "-ac", str(track.channels), "-i", "pipe:0",
+        "-threads", "0", *FFMPEG_ENCODERS[fmt], str(path),
+    ]
+    subprocess.run(cmd, input=track.raw_data, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.PIPE, check=True)
+
+
+def _square_cumsum(audio: AudioSegment):
+    """Samples and the cumulative sum of squares per frame (csum[i] = frames [0, i))"""
+    samples = np.frombuffer(audio.raw_data, dtype=SAMPLE_DTYPES[audio.sample_width])
+    acc = np.float64 if audio.sample_width == 4 else np.int64
+    squares = np.square(samples.astype(acc), dtype=acc)
+    if audio.channels > 1:
+        squares = squares.reshape(-1, audio.channels).sum(axis=1)
+    csum = np.zeros(len(squares) + 1, dtype=acc)
+    np.cumsum(squares, out=csum[1:])
+    return samples, csum
+
+
+def detect_silence(audio: AudioSegment, min_silence_len: int = 1000,
+                   silence_thresh: float = -16, seek_step: int = 1) -> List[List[int]]:
+    """
+    Silent [start, end] ranges in ms, same result as pydub.silence.detect_silence
+
+    pydub slices and RMSes a min_silence_len window at every seek_step; here every
+    window's RMS comes from one cumulative sum of squared samples.
+    """
+    return _silent_ranges(audio, _square_cumsum(audio)[1], min_silence_len, silence_thresh, seek_step)
+
+
+def _silent_ranges(audio: AudioSegment, csum, min_silence_len: int,
+                   silence_thresh: float, seek_step: int) -> List[List[int]]:
+    """detect_silence over a precomputed _square_cumsum"""
+    seg_len = len(audio)
+    if seg_len < min_silence_len:
+        return []
+
+    thresh = db_to_float(silence_thresh) * audio.max_possible_amplitude
+
+    # Window starts (ms), always including the last full window
+    last_start = seg_len - min_silence_len
+    starts = np.arange(0, last_start + 1, seek_step)
+    if last_start % seek_step:
+        starts = np.append(starts, last_start)
+
+    # Frame bounds as AudioSegment slicing computes them; frames past the end count as zeros
+    frames = int(audio.frame_count())
+    lo = (starts * audio.frame_rate / 1000).astype(np.int64)
+    hi = ((starts + min_silence_len) * audio.frame_rate / 1000).astype(np.int64)
+    n = (hi - lo) * audio.channels
+    total = csum[np.minimum(hi, frames)] - csum[np.minimum(lo, frames)]
+    rms = np.floor(np.sqrt(total / np.maximum(n, 1)))
+
+    silent = starts[rms <= thresh]
+    if not len(silent):
+        return []
+
+    # Merge overlapping windows into ranges: break only where the next silent window
+    # neither directly follows nor overlaps the previous one
+    prev, cur = silent[:-1], silent[1:]
+    breaks = np.flatnonzero((cur != prev + seek_step) & (cur > prev + min_silence_len))
+    range_starts = np.concatenate(([silent[0]], cur[breaks]))
+    range_ends = np.concatenate((prev[breaks], [silent[-1]])) + min_silence_len
+    return [[int(a), int(b)] for a, b in zip(range_starts, range_ends)]
 
 
 def measure(audio: AudioSegment) -> Dict[str, float]:
@@ -220,13 +485,19 @@ def measure(audio: AudioSegment) -> Dict[str, float]:
     """
     duration_sec = len(audio) / 1000.0
 
-    # RMS and peak levels
-    rms_dbfs = audio.dBFS
-    peak_dbfs = audio.max_dBFS
+    # One pass over the samples feeds the levels and the silence windows alike
+    samples, csum = _square_cumsum(audio)
+
+    # RMS and peak levels (AudioSegment.dBFS / max_dBFS: integer RMS, |sample| peak)
+    full_scale = audio.max_possible_amplitude
+    rms = int(np.sqrt(csum[-1] / len(samples))) if len(samples) else 0
+    peak = int(np.abs(samples.astype(np.int64)).max()) if len(samples) else 0
+    rms_dbfs = ratio_to_db(rms, full_scale)
+    peak_dbfs = ratio_to_db(peak, full_scale)
 
     # Detect silence (threshold: -40 dBFS, min duration: 100ms)
-    silence_ranges = detect_silence(
-        audio,
+    silence_ranges = _silent_ranges(
+        audio, csum,
         min_silence_len=100,
         silence_thresh=-40,
         seek_step=10
@@ -244,6 +515,34 @@ def measure(audio: AudioSegment) -> Dict[str, float]:
     }
 
 
+# Level written to JSON for digital silence: measure() reports -inf dBFS there, and
+# orjson would silently turn it into null (readers then crash on None arithmetic)
+DBFS_FLOOR = -120.0
+
+
+def _finite(obj, key: str = ""):
+    """Copy of obj with non-finite *_dbfs levels floored; other non-finite floats are an error"""
+    if isinstance(obj, dict):
+        return {k: _finite(v, k) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v, key) for v in obj]
+    if isinstance(obj, float) and not math.isfinite(obj):
+        if key.endswith("_dbfs") and not obj > 0:  # -inf (silence) or NaN
+            return DBFS_FLOOR
+        raise ValueError(f"Non-finite value for {key or 'metric'}: {obj}")
+    return obj
+
+
+def dump_metrics(obj) -> bytes:
+    """
+    Serialize metrics (or a report holding them) to indented JSON bytes
+
+    -inf/NaN levels under *_dbfs keys are written as DBFS_FLOOR, so silent tracks
+    round-trip as numbers instead of null.
+    """
+    return orjson.dumps(_finite(obj), option=orjson.OPT_INDENT_2)
+
+
 def apply_style_prefix(text: str, style_prefix: str = None) -> str:
     """
     Prepend style instruction to text
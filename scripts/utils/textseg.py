@@ -20,8 +20,22 @@ ABBREVIATIONS = {
     'Vol', 'Ver', 'Ed', 'p', 'pp', 'cf', 'approx', 'est'
 }
 
-# Build set of abbreviations for checking
-# We'll use a different approach: filter out false positives after matching
+# Precompiled patterns (module scope: no per-call re cache lookup)
+# Runs of 2+ spaces (tabs are already spaces when it runs; lone spaces need no rewrite)
+_WS_RE = re.compile(r' {2,}')
+_PARA_RE = re.compile(r'\n\s*\n+')
+# Sentence-ending punctuation + optional quotes/parens + whitespace
+_SENT_RE = re.compile(r'([.!?])(["\')\]]*)\s+')
+# Comma NOT followed by a digit (to exclude 1,000)
+_COMMA_RE = re.compile(r',(?!\d)')
+
+# Case-insensitive lookup set, built once rather than per candidate period
+_ABBREVIATIONS_LOWER = frozenset(a.lower() for a in ABBREVIATIONS)
+
+
+def _is_word_char(ch: str) -> bool:
+    """Same class as the regex \\w on str patterns"""
+    return ch.isalnum() or ch == '_'
 
 
 def normalize_whitespace(text: str) -> str:
@@ -31,7 +45,7 @@ def normalize_whitespace(text: str) -> str:
     # Tabs to spaces
     text = text.replace('\t', ' ')
     # Collapse multiple spaces (but preserve newlines)
-    text = re.sub(r'[ \t]+', ' ', text)
+    text = _WS_RE.sub(' ', text)
     return text
 
 
@@ -39,35 +53,38 @@ def split_paragraphs(text: str) -> List[str]:
     """Split text into paragraphs by blank lines (\\n\\n+)"""
     text = normalize_whitespace(text)
     # Split by blank lines (one or more consecutive newlines with optional spaces)
-    paragraphs = re.split(r'\n\s*\n+', text)
+    paragraphs = _PARA_RE.split(text)
     # Strip and filter empty
     return [p.strip() for p in paragraphs if p.strip()]
 
 
 def _is_abbreviation(text: str, pos: int) -> bool:
     """Check if a period at position is part of an abbreviation"""
-    # Look backward for abbreviation pattern (including multi-part like e.g.)
-    # Check for patterns like "e.g." where there might be multiple periods
-    before = text[:pos+1]
-
-    # Check for multi-dot abbreviations (e.g., i.e.)
-    # Look for pattern: letter.letter. at the end
-    if re.search(r'\b\w\.\w\.$', before):
+    # Only the word run right before the period matters, so walk back over it
+    # instead of regex-searching the whole text[:pos] prefix for every candidate
+    start = pos
+    while start > 0 and _is_word_char(text[start - 1]):
+        start -= 1
+    if start == pos:
+        # Nothing word-like before the period
+        return False
+
+    # Multi-dot abbreviations (e.g., i.e.): single letter, dot, single letter, dot
+    if (pos >= 3 and start == pos - 1 and text[pos - 2] == '.'
+            and _is_word_char(text[pos - 3])
+            and (pos == 3 or not _is_word_char(text[pos - 4]))):
         return True
 
-    # Extract word before the period
-    match = re.search(r'(\b\w+)\.?$', before)
-    if match:
-        word = match.group(1)
-        # Check if it's in our abbreviation list (case-insensitive)
-        if word in ABBREVIATIONS or word.lower() in {a.lower() for a in ABBREVIATIONS}:
-            return True
-        # Check for single letter abbreviations (e.g., "A. Smith")
-        if len(word) == 1 and word.isupper():
-            return True
-        # Check for numbers with decimal points (1.5, 3.14)
-        if re.search(r'\d+\.\d*$', before):
-            return True
+    word = text[start:pos]
+    # Check if it's in our abbreviation list (case-insensitive)
+    if word.lower() in _ABBREVIATIONS_LOWER:
+        return True
+    # Check for single letter abbreviations (e.g., "A. Smith")
+    if len(word) == 1 and word.isupper():
+        return True
+    # Check for numbers with decimal points (1.5, 3.14)
+    if text[pos - 1].isdecimal():
+        return True
 
     return False
 
@@ -88,11 +105,8 @@ def split_sentences(paragraph: str) -> List[Tuple[str, str]]:
 
     chunks = []
 
-    # Pattern: sentence-ending punctuation + optional quotes/parens + whitespace
-    sentence_pattern = r'([.!?])(["\')\]]*)\s+'
-
     # Find all potential sentence boundaries
-    potential_splits = list(re.finditer(sentence_pattern, paragraph))
+    potential_splits = list(_SENT_RE.finditer(paragraph))
 
     # Filter out abbreviations
     valid_splits = []
@@ -148,29 +162,27 @@ def _split_by_commas(text: str) -> List[Tuple[str, str]]:
     Returns:
         List of (chunk_text, 'short') tuples
     """
-    # Pattern: comma NOT followed by a digit (to exclude 1,000)
-    # and NOT preceded by abbreviation patterns
-    comma_pattern = r',(?!\d)'
+    # Comma positions only; chunks are sliced straight from the text
+    positions = [m.start() for m in _COMMA_RE.finditer(text)]
 
-    splits = re.split(comma_pattern, text)
-
-    if len(splits) <= 1:
+    if not positions:
         # No comma splits, return as single chunk
         return [(text.strip(), 'none')]
 
     chunks = []
-    for i, chunk in enumerate(splits):
-        chunk = chunk.strip()
+    prev = 0
+    for pos in positions:
+        chunk = text[prev:pos].strip()
+        prev = pos + 1
         if not chunk:
             continue
+        # Add comma back; all comma-split chunks get 'short' pause
+        chunks.append((chunk + ',', 'short'))
 
-        # Add comma back (except for last chunk where we split it off)
-        if i < len(splits) - 1:
-            chunk = chunk + ','
-
-        # All comma-split chunks get 'short' pause except the last
-        pause = 'short' if i < len(splits) - 1 else 'none'
-        chunks.append((chunk, pause))
+    # Text after the last comma gets no pause
+    tail = text[prev:].strip()
+    if tail:
+        chunks.append((tail, 'none'))
 
     return chunks
 
@@ -11,13 +11,16 @@ from pathlib import Path
 def generate_tone(frequency_hz: float, duration_sec: float, sample_rate: int = 44100) -> AudioSegment:
     """Generate a sine wave tone"""
     num_samples = int(duration_sec * sample_rate)
-    t = np.linspace(0, duration_sec, num_samples, False)
+    # Phase per sample in float32 (int16 output needs no more precision)
+    wave = np.arange(num_samples, dtype=np.float32)
+    wave *= np.float32(2 * np.pi * frequency_hz / sample_rate)
 
-    # Generate sine wave
-    wave = np.sin(2 * np.pi * frequency_hz * t)
+    # Generate sine wave in place
+    np.sin(wave, out=wave)
 
     # Convert to 16-bit PCM
-    audio_array = (wave * 32767).astype(np.int16)
+    wave *= np.float32(32767)
+    audio_array = wave.astype(np.int16)
 
     # Create AudioSegment
     audio = AudioSegment(
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures
+"""
+
+import json
+import os
+import sys
+import threading
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from pydub import AudioSegment
+
+
+# Scripts import each other as top-level modules (tts_common, tts_cache, ...);
+# put scripts/ on the path once here instead of in every test module
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def pytest_configure(config):
+    """
+    Keep tmp_path directories on RAM-backed /dev/shm where it exists (Linux)
+
+    Only the root moves: pytest still creates pytest-of-<user>/pytest-N under it
+    and keeps the last few runs. An explicit --basetemp or PYTEST_DEBUG_TEMPROOT wins.
+    Also selects matplotlib's headless Agg backend for this process and any child.
+    """
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+    shm = "/dev/shm"
+    if config.option.basetemp or "PYTEST_DEBUG_TEMPROOT" in os.environ:
+        return
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        os.environ["PYTEST_DEBUG_TEMPROOT"] = shm
+
+
+def _read_wav(path):
+    """Decode a PCM WAV with the stdlib wave module (no ffmpeg/ffprobe round-trip)"""
+    with wave.open(str(path), "rb") as w:
+        return AudioSegment(
+            data=w.readframes(w.getnframes()),
+            sample_width=w.getsampwidth(),
+            frame_rate=w.getframerate(),
+            channels=w.getnchannels(),
+        )
+
+
+@pytest.fixture(scope="session")
+def fake_audio():
+    """fake.wav (440 Hz tone, 0.5 s), decoded once; AudioSegment operations return new segments"""
+    return _read_wav(DATA_DIR / "fake.wav")
+
+
+@pytest.fixture(scope="session")
+def silence_audio():
+    """silence_500ms.wav, decoded once"""
+    return _read_wav(DATA_DIR / "silence_500ms.wav")
+
+
+@pytest.fixture(scope="session")
+def tiny_audio():
+    """50 ms of 16-bit mono silence for tests that only check track lengths"""
+    return AudioSegment.silent(duration=50, frame_rate=22050)
+
+
+@pytest.fixture(scope="session")
+def silent_wav(tmp_path_factory):
+    """1 s of silence exported to WAV once per session; copy it rather than re-exporting"""
+    path = tmp_path_factory.mktemp("shared") / "silent.wav"
+    AudioSegment.silent(duration=1000).export(path, format="wav")
+    return path
+
+
+class _SpeechHandler(BaseHTTPRequestHandler):
+    """POST /v1/audio/speech -> the server's current body, streamed like the real endpoint"""
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests.append(request)
+        if self.path.rstrip("/") != "/v1/audio/speech":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *args):
+        pass  # keep pytest output clean
+
+
+@pytest.fixture(scope="session")
+def speech_server():
+    """
+    Loopback stand-in for the OpenAI speech endpoint, one per session
+
+    Set .body to the bytes to serve; .requests collects the JSON bodies it got.
+    Point a client at it with base_url=server.base_url (or OPENAI_BASE_URL).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SpeechHandler)
+    server.body = b""
+    server.requests = []
+    server.base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
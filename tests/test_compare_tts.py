@@ -9,12 +9,34 @@ import os
 import shutil
 from pathlib import Path
 
-# Add scripts to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
-
 import pytest
 
 
+@pytest.fixture
+def fake_engines(tmp_path, monkeypatch):
+    """
+    Stand-in for the engine subprocesses: call it with {script name: writer(opts)}
+
+    Each writer gets the command's --flag -> value pairs and fakes that engine's
+    outputs; scripts without a writer "succeed" without writing anything. Runs in
+    tmp_path, since compare_tts puts work/<slug>/ under the cwd.
+    """
+    import subprocess
+    monkeypatch.chdir(tmp_path)
+
+    def install(writers):
+        def mock_run(cmd, **kwargs):
+            # [python, script, input, --flag, value, ...]
+            writer = writers.get(Path(cmd[1]).name)
+            if writer:
+                writer(dict(zip(cmd[:-1], cmd[1:])))
+            return subprocess.CompletedProcess(cmd, 0, "", "")
+
+        monkeypatch.setattr(subprocess, "run", mock_run)
+
+    return install
+
+
 class TestCompareDriver:
     """Integration tests for compare_tts.py"""
 
@@ -24,10 +46,9 @@ class TestCompareDriver:
         assert hasattr(compare_tts, 'run_command')
         assert hasattr(compare_tts, 'main')
 
-    def test_compare_with_mocked_engines(self, tmp_path, monkeypatch):
+    def test_compare_with_mocked_engines(self, tmp_path, monkeypatch, silent_wav, fake_engines):
         """Test comparison with mocked TTS engines"""
         from scripts import compare_tts
-        import subprocess
 
         # Create test input
         input_file = tmp_path / "input.txt"
@@ -35,30 +56,23 @@ class TestCompareDriver:
 
         outdir = tmp_path / "output"
 
-        # Mock subprocess.run to avoid real API calls
-        def mock_run(cmd, **kwargs):
-            # Create fake output files
-            if "openai_tts.py" in " ".join(cmd):
-                output_path = [arg for i, arg in enumerate(cmd) if cmd[i-1] == "--output"][0]
-                # Create minimal WAV file
-                from pydub import AudioSegment
-                AudioSegment.silent(duration=1000).export(output_path, format="wav")
-
-                # Create metrics
-                json_path = [arg for i, arg in enumerate(cmd) if cmd[i-1] == "--json-out"][0]
-                Path(json_path).write_text('{"duration_sec": 1.0, "rms_dbfs": -20.0, "peak_dbfs": -3.0, "silence_ratio": 10.0}')
+        # Fake engine outputs; piper writes nothing (comparison goes OpenAI only)
+        def openai_outputs(opts):
+            # Minimal WAV file (exported once per session)
+            shutil.copyfile(silent_wav, opts["--output"])
+            # Create metrics
+            Path(opts["--json-out"]).write_text('{"duration_sec": 1.0, "rms_dbfs": -20.0, "peak_dbfs": -3.0, "silence_ratio": 10.0}')
 
-            return subprocess.CompletedProcess(cmd, 0, "", "")
-
-        monkeypatch.setattr(subprocess, "run", mock_run)
+        # Mock the engine subprocesses to avoid real API calls
+        fake_engines({"openai_tts.py": openai_outputs})
 
         # Run comparison
         import sys
-        sys.argv = [
+        monkeypatch.setattr(sys, "argv", [
             "compare_tts.py",
             str(input_file),
             "--outdir", str(outdir)
-        ]
+        ])
 
         result = compare_tts.main()
 
@@ -67,6 +81,41 @@ class TestCompareDriver:
         # Output directory should exist
         assert outdir.exists()
 
+    def test_compare_silent_tracks(self, tmp_path, monkeypatch, silent_wav, fake_engines):
+        """Silent outputs (-inf dBFS) land in the report as the dBFS floor, never null"""
+        from scripts import compare_tts
+        from scripts.tts_common import DBFS_FLOOR, dump_metrics, measure
+        from pydub import AudioSegment
+        import orjson
+
+        input_file = tmp_path / "input.txt"
+        input_file.write_text("Short test.")
+        silent = measure(AudioSegment.silent(duration=1000))
+
+        def openai_outputs(opts):
+            shutil.copyfile(silent_wav, opts["--output"])
+            # Written the way json.dump did before the orjson switch
+            Path(opts["--json-out"]).write_text(
+                '{"duration_sec": 1.0, "rms_dbfs": -Infinity, "peak_dbfs": -Infinity, "silence_ratio": 100.0}')
+
+        def piper_outputs(opts):
+            shutil.copyfile(silent_wav, opts["--output"])
+            Path(opts["--json-out"]).write_bytes(dump_metrics(silent))
+
+        fake_engines({"openai_tts.py": openai_outputs, "piper_tts.py": piper_outputs})
+        monkeypatch.setattr(sys, "argv", [
+            "compare_tts.py", str(input_file), "--outdir", str(tmp_path / "output")
+        ])
+
+        assert compare_tts.main() == 0
+
+        report_path, = (tmp_path / "work").glob("*/compare_report.json")
+        report = orjson.loads(report_path.read_bytes())
+        for engine in ("openai", "piper"):
+            assert report[engine]["rms_dbfs"] == DBFS_FLOOR
+            assert report[engine]["peak_dbfs"] == DBFS_FLOOR
+        assert report["comparison"]["rms_diff_db"] == 0.0
+
     def test_compare_report_structure(self, tmp_path):
         """Test that comparison report has correct structure"""
         # This test verifies the report format
@@ -94,6 +143,90 @@ class TestCompareDriver:
         assert "comparison" in report
 
 
+class TestABSwapMix:
+    """Test the A/B swap mix used for blind listening"""
+
+    def test_alternates_segments(self):
+        """A and B slices alternate and cover the common length twice"""
+        from scripts.compare_tts import ab_swap_mix
+        from pydub import AudioSegment
+        from pydub.generators import Sine
+
+        a = Sine(440).to_audio_segment(duration=2500).set_frame_rate(24000).set_channels(1)
+        b = AudioSegment.silent(duration=2000, frame_rate=24000)
+
+        mix = ab_swap_mix(a, b, 1000)
+
+        assert mix.frame_rate == 24000
+        assert len(mix) == 4000  # A0 B0 A1 B1 over the common 2s
+        assert mix[0:1000].rms > 0
+        assert mix[1000:2000].rms == 0
+        assert mix[2000:3000].rms > 0
+
+    def test_mismatched_formats_are_synced(self):
+        """Different sample rates/channels are converted before mixing"""
+        from scripts.compare_tts import ab_swap_mix
+        from pydub import AudioSegment
+
+        a = AudioSegment.silent(duration=1000, frame_rate=24000)
+        b = AudioSegment.silent(duration=1000, frame_rate=22050).set_channels(2)
+
+        mix = ab_swap_mix(a, b, 500)
+
+        assert mix.frame_rate == 24000
+        assert mix.channels == 2
+        assert abs(len(mix) - 2000) <= 1
+
+
+class TestMatchCache:
+    """Test reuse of volume-matched outputs"""
+
+    def test_match_cache_hit(self, tmp_path, monkeypatch):
+        """Unchanged sources are copied from the cache; changed sources are matched again"""
+        from scripts import compare_tts
+        from pydub.generators import Sine
+
+        openai_out, piper_out = tmp_path / "openai.wav", tmp_path / "piper.wav"
+        Sine(440).to_audio_segment(duration=500).apply_gain(-20).export(openai_out, format="wav")
+        Sine(330).to_audio_segment(duration=500).export(piper_out, format="wav")
+
+        paths, reused = compare_tts.write_matched(openai_out, "wav", piper_out, tmp_path)
+        assert not reused
+        first = [p.read_bytes() for p in paths]
+
+        # A hit never reaches match_volume
+        def no_match(*a, **kw):
+            raise AssertionError("match_volume called on a cache hit")
+
+        monkeypatch.setattr(compare_tts, "match_volume", no_match)
+        paths, reused = compare_tts.write_matched(openai_out, "wav", piper_out, tmp_path)
+        assert reused
+        assert [p.name for p in paths] == ["openai_match.wav", "piper_match.wav"]
+        assert [p.read_bytes() for p in paths] == first
+
+        Sine(550).to_audio_segment(duration=500).export(piper_out, format="wav")
+        with pytest.raises(AssertionError, match="cache hit"):
+            compare_tts.write_matched(openai_out, "wav", piper_out, tmp_path)
+
+    def test_match_cache_drops_stale_entries(self, tmp_path):
+        """Matching new sources replaces the previous sources' cache entries"""
+        from scripts import compare_tts
+        from pydub.generators import Sine
+
+        openai_out, piper_out = tmp_path / "openai.wav", tmp_path / "piper.wav"
+        Sine(440).to_audio_segment(duration=300).export(openai_out, format="wav")
+        Sine(330).to_audio_segment(duration=300).export(piper_out, format="wav")
+        compare_tts.write_matched(openai_out, "wav", piper_out, tmp_path)
+        first = sorted(p.name for p in (tmp_path / ".match_cache").iterdir())
+        assert len(first) == 2
+
+        Sine(550).to_audio_segment(duration=300).export(piper_out, format="wav")
+        compare_tts.write_matched(openai_out, "wav", piper_out, tmp_path)
+        second = sorted(p.name for p in (tmp_path / ".match_cache").iterdir())
+        assert len(second) == 2
+        assert not set(first) & set(second)
+
+
 class TestCompareOutputStructure:
     """Test output directory structure"""
 
@@ -10,9 +10,6 @@ from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
 import io
 
-# Add scripts to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
-
 import pytest
 from pydub import AudioSegment
 
@@ -21,40 +18,66 @@ from pydub import AudioSegment
 RUN_LIVE = os.getenv("RUN_LIVE_TTS") == "1"
 
 
+@pytest.fixture(scope="class")
+def patched_openai():
+    """OpenAI class patched once per test class (patch setup/teardown is not free)"""
+    with patch("scripts.openai_tts.OpenAI") as mock_client_class:
+        yield mock_client_class
+
+
 class TestOpenAITTSMocked:
     """Mocked tests for OpenAI TTS (no API calls)"""
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def fake_audio_bytes(self):
-        """Generate fake audio bytes for mocking"""
+        """Generate fake audio bytes for mocking (read once; bytes are immutable)"""
         # Load our test fixture
-        fixture_path = Path(__file__).parent / "data" / "fake.wav"
-        with open(fixture_path, "rb") as f:
-            return f.read()
+        return (Path(__file__).parent / "data" / "fake.wav").read_bytes()
+
+    @pytest.fixture(scope="module")
+    def fake_pcm_bytes(self, fake_audio_bytes):
+        """The fixture tone as a raw "pcm" response body: headerless 24 kHz 16-bit mono"""
+        tone = AudioSegment.from_wav(io.BytesIO(fake_audio_bytes))
+        return tone.set_frame_rate(24000).set_channels(1).set_sample_width(2).raw_data
+
+    @pytest.fixture(autouse=True)
+    def isolated_cache(self, tmp_path, monkeypatch):
+        """Keep the segment cache out of the real ~/.cache during tests"""
+        from scripts import openai_tts
+        monkeypatch.setattr(openai_tts, "CACHE_DIR", tmp_path / "tts_cache")
 
     @pytest.fixture
-    def mock_openai_client(self, fake_audio_bytes):
-        """Create mocked OpenAI client"""
-        with patch("scripts.openai_tts.OpenAI") as mock_client_class:
-            mock_client = Mock()
-            mock_response = Mock()
-            mock_response.content = fake_audio_bytes
+    def mock_openai_client(self, patched_openai, fake_audio_bytes, fake_pcm_bytes):
+        """Create mocked OpenAI client (a fresh client per test, so call counts and side effects never leak)"""
+        mock_client_class = patched_openai
+        mock_client_class.reset_mock()
+        mock_client = MagicMock()
+        mock_response = Mock()
+
+        # Mock the nested structure: with client.audio.speech.with_streaming_response.create() as r
+        stream = mock_client.audio.speech.with_streaming_response.create
+
+        # The body matches the requested response_format, streamed in two chunks
+        def iter_bytes(*a):
+            pcm = stream.call_args.kwargs.get("response_format") == "pcm"
+            body = fake_pcm_bytes if pcm else fake_audio_bytes
+            return iter([body[:100], body[100:]])
 
-            # Mock the nested structure: client.audio.speech.create()
-            mock_client.audio.speech.create.return_value = mock_response
-            mock_client_class.return_value = mock_client
+        mock_response.iter_bytes.side_effect = iter_bytes
+        stream.return_value.__enter__.return_value = mock_response
+        mock_client_class.return_value = mock_client
 
-            yield mock_client_class
+        return mock_client_class
 
     def test_synthesize_segment_mocked(self, mock_openai_client, fake_audio_bytes, tmp_path):
         """Test synthesizing a single segment with mocked API"""
         from scripts.openai_tts import synthesize_segment
-        from openai import OpenAI
 
         # Set fake API key
         os.environ["OPENAI_API_KEY"] = "fake-key-for-testing"
 
-        client = OpenAI(api_key="fake-key")
+        # Client comes from the patched OpenAI class (no network)
+        client = mock_openai_client(api_key="fake-key")
         text = "This is a test sentence."
 
         audio = synthesize_segment(
@@ -62,13 +85,99 @@ class TestOpenAITTSMocked:
             text=text,
             model="tts-1",
             voice="onyx",
-            response_format="mp3"
+            response_format="wav"
         )
 
         # Should return an AudioSegment
         assert isinstance(audio, AudioSegment)
         assert len(audio) > 0
 
+    def test_synthesize_segment_pcm(self, mock_openai_client, fake_pcm_bytes):
+        """A pcm response becomes the segment's samples as-is, no header or decoder involved"""
+        from scripts.openai_tts import synthesize_segment, SEGMENT_FORMAT, PCM_FRAME_RATE
+
+        client = mock_openai_client(api_key="fake-key")
+        audio = synthesize_segment(client, "Raw samples.", "tts-1", "onyx", SEGMENT_FORMAT)
+
+        kwargs = client.audio.speech.with_streaming_response.create.call_args.kwargs
+        assert kwargs["response_format"] == SEGMENT_FORMAT == "pcm"
+        assert audio.raw_data == fake_pcm_bytes
+        assert audio.frame_rate == PCM_FRAME_RATE
+        assert (audio.channels, audio.sample_width) == (1, 2)
+
+    def test_transient_errors_retried(self, mock_openai_client, monkeypatch):
+        """Connection errors back off and retry; exhausting retries raises under fail_fast"""
+        import openai
+        from scripts import openai_tts
+
+        sleeps = []
+        monkeypatch.setattr(openai_tts.time, "sleep", sleeps.append)
+        client = mock_openai_client(api_key="fake-key")
+        stream = client.audio.speech.with_streaming_response.create
+        ok = stream.return_value
+        err = openai.APIConnectionError(request=Mock())
+
+        stream.side_effect = [err, err, ok]
+        audio = openai_tts.synthesize_segment(client, "Retry me.", "tts-1", "onyx", "wav")
+        assert stream.call_count == 3
+        assert len(sleeps) == 2
+        assert len(audio) > 100
+
+        stream.side_effect = err
+        with pytest.raises(openai.APIConnectionError):
+            openai_tts.synthesize_segment(client, "Never works.", "tts-1", "onyx", "wav", fail_fast=True)
+
+        # Default keeps going with a short silence in place of the segment
+        audio = openai_tts.synthesize_segment(client, "Never works.", "tts-1", "onyx", "wav")
+        assert len(audio) == 100
+
+    def test_permanent_errors_not_retried(self, mock_openai_client):
+        """Non-transient errors fail on the first attempt"""
+        from scripts import openai_tts
+
+        client = mock_openai_client(api_key="fake-key")
+        stream = client.audio.speech.with_streaming_response.create
+        stream.side_effect = ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            openai_tts.synthesize_segment(client, "Bad.", "tts-1", "onyx", "wav", fail_fast=True)
+        assert stream.call_count == 1
+
+    def test_segment_cache_hit(self, mock_openai_client, tmp_path):
+        """Second synthesis of the same segment is served from disk, not the API"""
+        from scripts.openai_tts import synthesize_segment
+        from tts_cache import _CACHE_STATS  # the module openai_tts imported
+
+        client = mock_openai_client(api_key="fake-key")
+        cache_dir = tmp_path / "cache"
+        before = dict(_CACHE_STATS)
+
+        first = synthesize_segment(client, "Cached sentence.", "tts-1", "onyx", "wav", cache_dir=cache_dir)
+        second = synthesize_segment(client, "Cached sentence.", "tts-1", "onyx", "wav", cache_dir=cache_dir)
+
+        assert client.audio.speech.with_streaming_response.create.call_count == 1
+        assert _CACHE_STATS["hits"] - before["hits"] == 1
+        assert _CACHE_STATS["misses"] - before["misses"] == 1
+        assert len(list(cache_dir.glob("*.wav"))) == 1
+        assert len(first) == len(second) > 100  # real audio, not the silent error fallback
+        assert not list(cache_dir.glob("*.tmp"))
+
+        # A different voice is a different cache key
+        synthesize_segment(client, "Cached sentence.", "tts-1", "alloy", "wav", cache_dir=cache_dir)
+        assert client.audio.speech.with_streaming_response.create.call_count == 2
+
+    def test_decode_wav_and_pcm_without_ffmpeg(self, fake_audio_bytes):
+        """wav and raw pcm responses decode natively"""
+        from scripts.openai_tts import decode_audio, PCM_FRAME_RATE
+
+        wav = decode_audio(fake_audio_bytes, "wav")
+        assert len(wav) > 0
+
+        pcm = decode_audio(b"\x00\x00" * PCM_FRAME_RATE, "pcm")
+        assert pcm.frame_rate == PCM_FRAME_RATE
+        assert pcm.channels == 1
+        assert len(pcm) == 1000
+
     def test_build_audio_with_pauses_mocked(self, mock_openai_client, tmp_path):
         """Test building audio with pauses (mocked) - now uses tts_common.build_track"""
         # This functionality is now tested in test_tts_common.py
@@ -77,7 +186,7 @@ class TestOpenAITTSMocked:
         assert hasattr(openai_tts, 'synthesize_segment')
         assert hasattr(openai_tts, 'resolve_defaults')
 
-    def test_main_execution_mocked(self, mock_openai_client, tmp_path):
+    def test_main_execution_mocked(self, mock_openai_client, tmp_path, monkeypatch):
         """Test full TTS execution via main() with mocked API"""
         import sys
         from scripts import openai_tts
@@ -92,11 +201,11 @@ class TestOpenAITTSMocked:
         output_path = tmp_path / "output.wav"
 
         # Simulate command-line arguments
-        sys.argv = [
+        monkeypatch.setattr(sys, "argv", [
             "openai_tts.py",
             str(input_file),
             "--output", str(output_path)
-        ]
+        ])
 
         # Run main
         result = openai_tts.main()
@@ -106,6 +215,70 @@ class TestOpenAITTSMocked:
         assert output_path.exists()
         assert output_path.stat().st_size > 0
 
+    def test_main_pcm_output_without_ffmpeg(self, mock_openai_client, tmp_path, monkeypatch):
+        """--format pcm writes the raw samples directly (no ffmpeg muxer involved)"""
+        from scripts import openai_tts
+
+        os.environ["OPENAI_API_KEY"] = "fake-key-for-testing"
+        input_file = tmp_path / "input.txt"
+        input_file.write_text("This is a short test.")
+        output_path = tmp_path / "output.pcm"
+
+        monkeypatch.setattr(sys, "argv", ["openai_tts.py", str(input_file), "--output", str(output_path), "--format", "pcm"])
+        assert openai_tts.main() == 0
+
+        data = output_path.read_bytes()
+        assert len(data) > 0
+        assert not data.startswith(b"RIFF")
+
+    def test_main_dedups_repeated_segments(self, mock_openai_client, tmp_path, monkeypatch):
+        """Identical segments hit the API once but still appear in the track"""
+        from scripts import openai_tts
+
+        os.environ["OPENAI_API_KEY"] = "fake-key-for-testing"
+        input_file = tmp_path / "input.txt"
+        input_file.write_text("Breaking news.\n\nFirst story.\n\nBreaking news.")
+
+        monkeypatch.setattr(sys, "argv", ["openai_tts.py", str(input_file), "--output", str(tmp_path / "out.wav"),
+                                          "--max-chars", "20", "--no-cache"])
+        assert openai_tts.main() == 0
+
+        client = mock_openai_client.return_value
+        assert client.audio.speech.with_streaming_response.create.call_count == 2
+
+    def test_main_empty_input(self, mock_openai_client, tmp_path, monkeypatch):
+        """Blank input is rejected without any API call, even with a style prefix"""
+        from scripts import openai_tts
+
+        os.environ["OPENAI_API_KEY"] = "fake-key-for-testing"
+        input_file = tmp_path / "input.txt"
+        input_file.write_text("  \n\n \n")
+
+        monkeypatch.setattr(sys, "argv", ["openai_tts.py", str(input_file), "--output", str(tmp_path / "out.wav"),
+                                          "--style-prefix", "Speak calmly.", "--no-cache"])
+        assert openai_tts.main() == 1
+        assert not (tmp_path / "out.wav").exists()
+
+    def test_main_male_voices(self, mock_openai_client, tmp_path, monkeypatch):
+        """--male-voices renders one suffixed track per male voice from one segmentation"""
+        from scripts import openai_tts
+
+        os.environ["OPENAI_API_KEY"] = "fake-key-for-testing"
+        input_file = tmp_path / "input.txt"
+        input_file.write_text("First story.\n\nSecond story.")
+
+        monkeypatch.setattr(sys, "argv", ["openai_tts.py", str(input_file), "--output", str(tmp_path / "out.wav"),
+                                          "--max-chars", "20", "--no-cache", "--male-voices",
+                                          "--json-out", str(tmp_path / "metrics.json")])
+        assert openai_tts.main() == 0
+
+        create = mock_openai_client.return_value.audio.speech.with_streaming_response.create
+        assert create.call_count == 2 * len(openai_tts.MALE_VOICES)
+        assert {c.kwargs["voice"] for c in create.call_args_list} == set(openai_tts.MALE_VOICES)
+        for voice in openai_tts.MALE_VOICES:
+            assert (tmp_path / f"out_{voice}.wav").exists()
+            assert (tmp_path / f"metrics_{voice}.json").exists()
+
     def test_voice_presets_loaded(self):
         """Test that voice presets are loaded"""
         from scripts.openai_tts import VOICE_PRESETS
@@ -134,6 +307,88 @@ class TestOpenAITTSMocked:
             assert "medium" in profile
             assert "long" in profile
 
+    def test_presets_read_only(self):
+        """Module-level preset tables can't be mutated by callers"""
+        from scripts.openai_tts import PAUSE_PROFILES, VOICE_PRESETS
+
+        with pytest.raises(TypeError):
+            PAUSE_PROFILES["natural"]["short"] = 0.0
+        with pytest.raises(TypeError):
+            VOICE_PRESETS["new"] = {}
+
+    def test_resolve_defaults_nested_config(self):
+        """Dotted config paths resolve through the flattened config; CLI still wins"""
+        import argparse
+        from scripts.openai_tts import resolve_defaults, flatten_config
+
+        config = {"tts": {"voice": "nova", "fade_ms": 0, "opts": {}}, "video": {"fps": 30}}
+        assert flatten_config(config) == {"tts.voice": "nova", "tts.fade_ms": 0, "video.fps": 30}
+
+        names = ["preset", "model", "voice", "format", "speed", "pause_profile", "pause_short",
+                 "pause_medium", "pause_long", "fade_ms", "crossfade_ms", "max_chars",
+                 "style_prefix", "concurrency"]
+        args = resolve_defaults(argparse.Namespace(**dict.fromkeys(names)), config, {})
+        assert args.voice == "nova"
+        assert args.fade_ms == 0
+        assert args.crossfade_ms == 50
+
+        args = argparse.Namespace(**dict.fromkeys(names))
+        args.voice = "echo"
+        assert resolve_defaults(args, config, {}).voice == "echo"
+
+    def test_expand_env_vars(self, monkeypatch):
+        """Templated strings expand; plain strings come back untouched"""
+        from scripts.openai_tts import expand_env_vars
+
+        monkeypatch.setenv("YT_AUTO_TEST_DIR", "/data")
+        cfg = {"a": "$YT_AUTO_TEST_DIR/out", "b": ["plain", "~"], "c": 3, "d": "x~y"}
+        out = expand_env_vars(cfg)
+
+        assert out["a"] == "/data/out"
+        assert out["b"] == ["plain", str(Path.home())]
+        assert out["c"] == 3
+        assert out["d"] == "x~y"
+
+    def test_load_env_chained_reference(self, tmp_path, monkeypatch):
+        """A .env value can reference a key set earlier in the same file"""
+        from scripts import openai_tts
+
+        (tmp_path / ".env").write_text(
+            "# comment\nYT_AUTO_TEST_A=/data\nYT_AUTO_TEST_B=$YT_AUTO_TEST_A/out\n",
+            encoding="utf-8")
+        monkeypatch.setattr(openai_tts, "PROJECT_ROOT", tmp_path)
+        monkeypatch.setattr(openai_tts, "_ENV_LOADED", False)
+        # Registered with monkeypatch so both keys are removed again afterwards
+        monkeypatch.setenv("YT_AUTO_TEST_A", "")
+        monkeypatch.setenv("YT_AUTO_TEST_B", "")
+
+        openai_tts.load_env()
+
+        assert os.environ["YT_AUTO_TEST_A"] == "/data"
+        assert os.environ["YT_AUTO_TEST_B"] == "/data/out"
+
+
+class TestOpenAITTSHttp:
+    """The real SDK client against a loopback speech endpoint (no patching, no network)"""
+
+    def test_synthesize_segment_over_http(self, speech_server, monkeypatch):
+        """Request and streamed PCM body go through the client's actual HTTP plumbing"""
+        pytest.importorskip("httpx")
+        from scripts.openai_tts import make_client, synthesize_segment, PCM_FRAME_RATE
+
+        speech_server.body = b"\x01\x00\xff\xff" * PCM_FRAME_RATE
+        monkeypatch.setenv("OPENAI_BASE_URL", speech_server.base_url)
+        client = make_client("fake-key", concurrency=2)
+        try:
+            audio = synthesize_segment(client, "Over HTTP.", "tts-1", "onyx", "pcm", fail_fast=True)
+        finally:
+            client.close()
+
+        assert audio.raw_data == speech_server.body
+        assert len(audio) == 2000
+        assert speech_server.requests[-1]["input"] == "Over HTTP."
+        assert speech_server.requests[-1]["response_format"] == "pcm"
+
 
 @pytest.mark.skipif(not RUN_LIVE, reason="set RUN_LIVE_TTS=1 for live API tests")
 class TestOpenAITTSLive:
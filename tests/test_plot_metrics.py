@@ -5,11 +5,27 @@ Tests CSV to PNG conversion, chart generation, and headless rendering
 """
 
 import csv
+import io
+import os
 import pathlib
-import subprocess
-import sys
+import numpy as np
 import pytest
 
+# In-process: matplotlib is imported (and its Agg backend selected) once, not per test
+from scripts.plot_tts_metrics import main as plot_main
+
+
+@pytest.fixture(scope="module", autouse=True)
+def warm_matplotlib():
+    """Render one throwaway figure so backend and font-cache setup happen once per module"""
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+    font_manager.fontManager  # loads (or builds, on a cold cache) the font list
+    fig = plt.figure()
+    fig.text(0.5, 0.5, "warm-up")  # resolves and loads the default font
+    fig.canvas.draw()
+    plt.close(fig)
+
 
 SAMPLE_ROWS = [
     {
@@ -33,89 +49,60 @@ SAMPLE_ROWS = [
 ]
 
 
-def write_csv(p):
-    """Write sample CSV file"""
-    with open(p, "w", newline="", encoding="utf-8") as fp:
-        w = csv.DictWriter(fp, fieldnames=SAMPLE_ROWS[0].keys())
-        w.writeheader()
-        w.writerows(SAMPLE_ROWS)
+def _serialize(rows):
+    """CSV text (header + rows) encoded to UTF-8 bytes"""
+    buf = io.StringIO(newline="")
+    w = csv.DictWriter(buf, fieldnames=rows[0].keys())
+    w.writeheader()
+    w.writerows(rows)
+    return buf.getvalue().encode("utf-8")
 
 
-class TestPlotMetrics:
-    """Test plot generation"""
+_CSV_BYTES = _serialize(SAMPLE_ROWS)
 
-    def test_plot_generates_pngs(self, tmp_path):
-        """Test that plot script generates PNG files"""
-        out_reports = tmp_path / "output" / "reports"
-        out_reports.mkdir(parents=True)
-        csvp = out_reports / "tts_compare_20250101_000000.csv"
-        write_csv(csvp)
 
-        plots = tmp_path / "output" / "reports" / "plots"
-        cmd = [
-            sys.executable,
-            "scripts/plot_tts_metrics.py",
-            "--csv-glob", str(out_reports / "tts_compare_*.csv"),
-            "--outdir", str(plots),
-            "--rolling", "2"
-        ]
-        r = subprocess.run(cmd, capture_output=True, text=True)
-        assert r.returncode == 0, f"Plot failed: {r.stderr}"
+def write_csv(p):
+    """Write sample CSV file"""
+    pathlib.Path(p).write_bytes(_CSV_BYTES)
 
-        # Check PNG outputs
-        outs = list(plots.glob("*.png"))
-        assert outs, "No plots generated"
 
-        names = {p.name for p in outs}
-        assert "rms_trend.png" in names
-        assert "duration_scatter.png" in names
-        assert "openai_silence_hist.png" in names
+def _pngs(d):
+    """Names of the PNG files in directory d (scandir entries, no Path objects)"""
+    with os.scandir(d) as it:
+        return {e.name for e in it if e.name.endswith(".png")}
 
-    def test_plot_with_title_suffix(self, tmp_path):
-        """Test plot with custom title suffix"""
-        out_reports = tmp_path / "output" / "reports"
-        out_reports.mkdir(parents=True)
-        csvp = out_reports / "tts_compare_20250101_000000.csv"
-        write_csv(csvp)
 
-        plots = tmp_path / "output" / "reports" / "plots"
-        cmd = [
-            sys.executable,
-            "scripts/plot_tts_metrics.py",
-            "--csv-glob", str(out_reports / "tts_compare_*.csv"),
-            "--outdir", str(plots),
-            "--title-suffix", "Test Run"
-        ]
-        r = subprocess.run(cmd, capture_output=True, text=True)
-        assert r.returncode == 0
+@pytest.fixture(scope="module")
+def sample_csv(tmp_path_factory):
+    """Sample report CSV written once and shared by the CLI flag variants"""
+    out_reports = tmp_path_factory.mktemp("reports")
+    write_csv(out_reports / "tts_compare_20250101_000000.csv")
+    return out_reports
 
-        # Should still generate plots
-        outs = list(plots.glob("*.png"))
-        assert len(outs) >= 3
 
-    def test_plot_with_limit(self, tmp_path):
-        """Test plot with row limit"""
-        out_reports = tmp_path / "output" / "reports"
-        out_reports.mkdir(parents=True)
-        csvp = out_reports / "tts_compare_20250101_000000.csv"
-        write_csv(csvp)
+class TestPlotMetrics:
+    """Test plot generation"""
 
-        plots = tmp_path / "output" / "reports" / "plots"
-        cmd = [
-            sys.executable,
-            "scripts/plot_tts_metrics.py",
-            "--csv-glob", str(out_reports / "tts_compare_*.csv"),
+    @pytest.mark.parametrize("extra_args", [
+        ["--rolling", "2"],
+        ["--title-suffix", "Test Run"],
+        ["--limit", "1"],
+    ], ids=["rolling", "title-suffix", "limit"])
+    def test_plot_generates_pngs(self, sample_csv, tmp_path, extra_args):
+        """Test that plot script generates PNG files for each CLI option"""
+        plots = tmp_path / "plots"
+        rc = plot_main([
+            "--csv-glob", str(sample_csv / "tts_compare_*.csv"),
             "--outdir", str(plots),
-            "--limit", "1"
-        ]
-        r = subprocess.run(cmd, capture_output=True, text=True)
-        assert r.returncode == 0
+            *extra_args
+        ])
+        assert rc == 0, "Plot failed"
 
-        # Should still generate plots with limited data
-        outs = list(plots.glob("*.png"))
-        assert len(outs) >= 3
+        # Check PNG outputs
+        names = _pngs(plots)
+        assert {"rms_trend.png", "duration_scatter.png", "openai_silence_hist.png"} <= names
 
-    def test_plot_empty_csv(self, tmp_path):
+    def test_plot_empty_csv(self, tmp_path, capsys):
         """Test plot with no data rows"""
         out_reports = tmp_path / "output" / "reports"
         out_reports.mkdir(parents=True)
@@ -127,17 +114,14 @@ class TestPlotMetrics:
             w.writeheader()
 
         plots = tmp_path / "output" / "reports" / "plots"
-        cmd = [
-            sys.executable,
-            "scripts/plot_tts_metrics.py",
+        rc = plot_main([
             "--csv-glob", str(out_reports / "tts_compare_*.csv"),
             "--outdir", str(plots)
-        ]
-        r = subprocess.run(cmd, capture_output=True, text=True)
-        assert r.returncode == 0
+        ])
+        assert rc == 0
 
         # Should handle gracefully
-        assert "No CSV rows found" in r.stdout or plots.exists()
+        assert "No CSV rows found" in capsys.readouterr().out or plots.exists()
 
     def test_plot_openai_only(self, tmp_path):
         """Test plot with OpenAI data only (Piper skipped)"""
@@ -164,20 +148,45 @@ class TestPlotMetrics:
             w.writerows(openai_only_rows)
 
         plots = tmp_path / "output" / "reports" / "plots"
-        cmd = [
-            sys.executable,
-            "scripts/plot_tts_metrics.py",
+        rc = plot_main([
             "--csv-glob", str(out_reports / "tts_compare_*.csv"),
             "--outdir", str(plots)
-        ]
-        r = subprocess.run(cmd, capture_output=True, text=True)
-        assert r.returncode == 0
+        ])
+        assert rc == 0
 
         # Should generate OpenAI plots only
-        names = {p.name for p in plots.glob("*.png")}
+        names = _pngs(plots)
         assert "openai_silence_hist.png" in names
         # Piper plot may or may not exist depending on skip logic
 
+    def test_rolling_mean_skips_missing(self):
+        """Rolling mean averages the non-missing values in each window"""
+        from scripts.plot_tts_metrics import rolling_mean
+
+        seq = [1.0, None, 3.0, 5.0, None, None, None, 2.0]
+        assert rolling_mean(seq, 2) == [1.0, 1.0, 3.0, 4.0, 5.0, None, None, 2.0]
+        assert rolling_mean(seq, 3) == pytest.approx([1.0, 1.0, 2.0, 4.0, 4.0, 5.0, None, 2.0])
+        assert rolling_mean(seq, 1) == seq
+
+    def test_load_rows_column_major(self, tmp_path):
+        """Rows load into per-column lists; absent columns and short rows read as missing"""
+        from scripts.plot_tts_metrics import load_rows, column
+
+        csvp = tmp_path / "tts_compare_20250101_000000.csv"
+        csvp.write_text("slug,openai_rms,openai_duration\ncmp_a,-20.1,8.2\n\ncmp_b,x\n", encoding="utf-8")
+
+        data = load_rows([str(csvp)])
+        assert data["slug"] == ["cmp_a", "cmp_b"]
+        assert data["_source"] == [str(csvp)] * 2
+        assert data["openai_rms"] == ["-20.1", "x"]
+        assert data["openai_duration"] == ["8.2", None]
+        assert data["piper_rms"] == [None, None]
+
+        rms = column(data, "openai_rms")
+        assert rms[0] == -20.1 and np.isnan(rms[1])
+        assert column(data, "openai_duration")[0] == 8.2
+        assert np.isnan(column(data, "piper_rms")).all()
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
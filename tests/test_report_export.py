@@ -4,11 +4,12 @@ Tests for compare_report_to_md.py - Report export functionality
 Tests JSON aggregation, CSV/Markdown generation, sorting, and error handling
 """
 
-import json
-import pathlib
-import subprocess
-import sys
+import contextlib
+import csv
+import io
+import pickle
 import tempfile
+import orjson
 import pytest
 
 
@@ -59,40 +60,54 @@ MIN_JSON_PP = {
 }
 
 
-def run_export(work_glob, outdir):
-    """Run compare_report_to_md.py with given parameters"""
-    cmd = [
-        sys.executable,
-        "scripts/compare_report_to_md.py",
-        "--work-glob", work_glob,
-        "--outdir", str(outdir)
-    ]
-    r = subprocess.run(cmd, capture_output=True, text=True)
-    assert r.returncode == 0, f"Export failed: {r.stderr}"
-    return r.stdout
+# Serialized once; tests write these bytes as compare_report.json
+MIN_JSON_OA_BYTES = orjson.dumps(MIN_JSON_OA)
+MIN_JSON_PP_BYTES = orjson.dumps(MIN_JSON_PP)
+
+
+def run_export(work_glob, outdir, capsys):
+    """Run compare_report_to_md.main in-process and return what it printed"""
+    from compare_report_to_md import main
+    capsys.readouterr()  # drop output from earlier steps of the test
+    rc = main(["--work-glob", work_glob, "--outdir", str(outdir)])
+    assert rc == 0, "Export failed"
+    return capsys.readouterr().out
+
+
+@pytest.fixture(scope="module")
+def exported_oa(tmp_path_factory):
+    """MIN_JSON_OA exported once per module; returns (outdir, CSV text)"""
+    from compare_report_to_md import main
+    base = tmp_path_factory.mktemp("export_oa")
+    w1 = base / "work" / "x1"
+    w1.mkdir(parents=True)
+    (w1 / "compare_report.json").write_bytes(MIN_JSON_OA_BYTES)
+
+    outdir = base / "custom_reports"
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert main(["--work-glob", str(base / "work/*/compare_report.json"),
+                     "--outdir", str(outdir)]) == 0
+    csvs = list(outdir.glob("*.csv"))
+    return outdir, csvs[0].read_text(encoding="utf-8")
 
 
 class TestReportExport:
     """Test report export functionality"""
 
-    def test_export_basic(self, tmp_path):
+    def test_export_basic(self, tmp_path, capsys):
         """Test basic export with two reports"""
         # Create first report (OpenAI only)
         w1 = tmp_path / "work" / "x1"
         w1.mkdir(parents=True)
-        (w1 / "compare_report.json").write_text(
-            json.dumps(MIN_JSON_OA), encoding="utf-8"
-        )
+        (w1 / "compare_report.json").write_bytes(MIN_JSON_OA_BYTES)
 
         # Create second report (both engines)
         w2 = tmp_path / "work" / "x2"
         w2.mkdir(parents=True)
-        (w2 / "compare_report.json").write_text(
-            json.dumps(MIN_JSON_PP), encoding="utf-8"
-        )
+        (w2 / "compare_report.json").write_bytes(MIN_JSON_PP_BYTES)
 
         outdir = tmp_path / "out"
-        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir)
+        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
 
         # Check output message
         assert "CSV:" in out
@@ -113,8 +128,8 @@ class TestReportExport:
         assert "slugB" in csvtext
 
         # Verify CSV has header + 2 data rows
-        lines = csvtext.strip().split("\n")
-        assert len(lines) == 3  # header + 2 rows
+        rows = list(csv.reader(io.StringIO(csvtext, newline="")))
+        assert len(rows) == 3  # header + 2 rows
 
         # Verify Markdown content
         mdtext = mds[0].read_text(encoding="utf-8")
@@ -123,10 +138,10 @@ class TestReportExport:
         assert "slugB" in mdtext
         assert "|" in mdtext  # Table format
 
-    def test_export_empty(self, tmp_path):
+    def test_export_empty(self, tmp_path, capsys):
         """Test export with no reports found"""
         outdir = tmp_path / "out"
-        out = run_export(str(tmp_path / "nonexistent/*/report.json"), outdir)
+        out = run_export(str(tmp_path / "nonexistent/*/report.json"), outdir, capsys)
 
         assert "Rows: 0" in out
 
@@ -140,13 +155,11 @@ class TestReportExport:
         mdtext = mds[0].read_text(encoding="utf-8")
         assert "No data found" in mdtext
 
-    def test_export_malformed_json(self, tmp_path):
+    def test_export_malformed_json(self, tmp_path, capsys):
         """Test that malformed JSON is skipped gracefully"""
         w1 = tmp_path / "work" / "good"
         w1.mkdir(parents=True)
-        (w1 / "compare_report.json").write_text(
-            json.dumps(MIN_JSON_OA), encoding="utf-8"
-        )
+        (w1 / "compare_report.json").write_bytes(MIN_JSON_OA_BYTES)
 
         w2 = tmp_path / "work" / "bad"
         w2.mkdir(parents=True)
@@ -155,13 +168,34 @@ class TestReportExport:
         )
 
         outdir = tmp_path / "out"
-        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir)
+        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
 
         # Should process the good one and skip the bad one
         assert "Rows: 1" in out
         assert "[skip]" in out  # Should print skip message
 
-    def test_export_missing_fields(self, tmp_path):
+    def test_export_legacy_silent_report(self, tmp_path, capsys):
+        """Old json.dump reports with -Infinity / null levels are kept, floored"""
+        w1 = tmp_path / "work" / "silent"
+        w1.mkdir(parents=True)
+        text = MIN_JSON_PP_BYTES.decode()
+        text = text.replace('"rms_dbfs":-20.5', '"rms_dbfs":-Infinity')
+        text = text.replace('"peak_dbfs":-3.2', '"peak_dbfs":null')
+        assert "-Infinity" in text and "null" in text
+        (w1 / "compare_report.json").write_text(text, encoding="utf-8")
+
+        outdir = tmp_path / "out"
+        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
+
+        assert "Rows: 1" in out
+        assert "[skip]" not in out
+        header, data = list(csv.reader(io.StringIO(
+            next(outdir.glob("*.csv")).read_text(encoding="utf-8"), newline="")))[:2]
+        assert data[header.index("piper_rms")] == "-120.0"
+        assert data[header.index("piper_peak")] == "-120.0"
+        assert data[header.index("openai_rms")] == "-19.0"
+
+    def test_export_missing_fields(self, tmp_path, capsys):
         """Test that missing fields are handled gracefully"""
         # Minimal JSON with only required fields
         minimal = {
@@ -171,12 +205,10 @@ class TestReportExport:
 
         w1 = tmp_path / "work" / "minimal"
         w1.mkdir(parents=True)
-        (w1 / "compare_report.json").write_text(
-            json.dumps(minimal), encoding="utf-8"
-        )
+        (w1 / "compare_report.json").write_bytes(orjson.dumps(minimal))
 
         outdir = tmp_path / "out"
-        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir)
+        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
 
         assert "Rows: 1" in out
 
@@ -185,42 +217,84 @@ class TestReportExport:
         csvtext = csvs[0].read_text(encoding="utf-8")
         assert "test" in csvtext  # slug from filename
 
-    def test_piper_skipped_flag(self, tmp_path):
+    def test_piper_skipped_flag(self, exported_oa):
         """Test that piper_skipped flag is correctly set"""
+        _, csvtext = exported_oa
+
+        # Should have True for piper_skipped
+        header, data = list(csv.reader(io.StringIO(csvtext, newline="")))[:2]
+
+        piper_skipped_idx = header.index("piper_skipped")
+        assert data[piper_skipped_idx] == "True"
+
+
+class TestReportCache:
+    """Test the incremental (mtime) row cache"""
+
+    def test_cache_reused_and_refreshed(self, tmp_path):
+        """Unchanged reports come from the cache; edited ones are re-parsed"""
+        from compare_report_to_md import load_rows, FIELDS
+
+        rp = tmp_path / "compare_report.json"
+        rp.write_bytes(MIN_JSON_OA_BYTES)
+
+        rows, cache = load_rows([str(rp)], {})
+        assert rows[0][FIELDS.index("slug")] == "slugA"
+        assert str(rp) in cache
+
+        # Cached row is returned without reading the file
+        stamp, row = cache[str(rp)]
+        fake = {str(rp): (stamp, ("cached",) + row[1:])}
+        rows, _ = load_rows([str(rp)], fake)
+        assert rows[0][0] == "cached"
+
+        # Changed file invalidates the entry
+        rp.write_bytes(MIN_JSON_PP_BYTES)
+        rows, _ = load_rows([str(rp)], fake)
+        assert rows[0][0] == "slugB"
+
+    def test_cache_file_written(self, tmp_path, capsys):
+        """CLI persists the cache next to the outputs"""
         w1 = tmp_path / "work" / "x1"
         w1.mkdir(parents=True)
-        (w1 / "compare_report.json").write_text(
-            json.dumps(MIN_JSON_OA), encoding="utf-8"
-        )
+        (w1 / "compare_report.json").write_bytes(MIN_JSON_OA_BYTES)
 
         outdir = tmp_path / "out"
-        run_export(str(tmp_path / "work/*/compare_report.json"), outdir)
+        run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
+        assert (outdir / ".cache.pkl").exists()
 
-        csvs = list(outdir.glob("*.csv"))
-        csvtext = csvs[0].read_text(encoding="utf-8")
+        # Second run (cache hit) produces the same row count
+        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
+        assert "Rows: 1" in out
 
-        # Should have True for piper_skipped
-        lines = csvtext.strip().split("\n")
-        header = lines[0].split(",")
-        data = lines[1].split(",")
+    @pytest.mark.parametrize("payload", [
+        b"",
+        b"\x80\x04\x95garbage",
+        b"cno_such_module\nThing\n.",
+        pickle.dumps(["not", "a", "dict"]),
+    ], ids=["empty", "corrupt", "missing-module", "not-a-dict"])
+    def test_unreadable_cache_rebuilt(self, tmp_path, capsys, payload):
+        """A cache that can't be used is ignored and rewritten, never fatal"""
+        from compare_report_to_md import load_cache
 
-        piper_skipped_idx = header.index("piper_skipped")
-        assert data[piper_skipped_idx] == "True"
+        w1 = tmp_path / "work" / "x1"
+        w1.mkdir(parents=True)
+        (w1 / "compare_report.json").write_bytes(MIN_JSON_OA_BYTES)
+        outdir = tmp_path / "out"
+        outdir.mkdir()
+        (outdir / ".cache.pkl").write_bytes(payload)
+
+        out = run_export(str(tmp_path / "work/*/compare_report.json"), outdir, capsys)
+        assert "Rows: 1" in out
+        assert load_cache(outdir / ".cache.pkl")  # replaced with a valid cache
 
 
 class TestReportExportCLI:
     """Test CLI options"""
 
-    def test_custom_output_dir(self, tmp_path):
+    def test_custom_output_dir(self, exported_oa):
         """Test custom output directory"""
-        w1 = tmp_path / "work" / "x1"
-        w1.mkdir(parents=True)
-        (w1 / "compare_report.json").write_text(
-            json.dumps(MIN_JSON_OA), encoding="utf-8"
-        )
-
-        custom_outdir = tmp_path / "custom_reports"
-        run_export(str(tmp_path / "work/*/compare_report.json"), custom_outdir)
+        custom_outdir, _ = exported_oa
 
         assert custom_outdir.exists()
         assert len(list(custom_outdir.glob("*.csv"))) == 1
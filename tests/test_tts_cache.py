@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for tts_cache.py - Content-addressed segment cache
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+from scripts.tts_cache import _CACHE_STATS, cache_path, get_or_synth, prune
+
+
+class TestGetOrSynth:
+    """Test cache hits, misses and failure handling"""
+
+    def test_miss_then_hit(self, tmp_path):
+        """Second lookup with the same key decodes the cached file without producing"""
+        calls = []
+
+        def produce(path):
+            calls.append(path)
+            path.write_bytes(b"audio")
+
+        first = get_or_synth(tmp_path, ("voice", "hello"), "wav", produce, Path.read_bytes)
+        second = get_or_synth(tmp_path, ("voice", "hello"), "wav", produce, Path.read_bytes)
+
+        assert first == second == b"audio"
+        assert len(calls) == 1
+        assert cache_path(tmp_path, ("voice", "hello"), "wav").exists()
+
+        # Different key parts are a different entry
+        get_or_synth(tmp_path, ("other", "hello"), "wav", produce, Path.read_bytes)
+        assert len(calls) == 2
+
+    def test_failed_decode_not_cached(self, tmp_path):
+        """Audio that doesn't decode is neither cached nor left behind as a temp file"""
+        def decode(path):
+            raise ValueError("corrupt")
+
+        with pytest.raises(ValueError):
+            get_or_synth(tmp_path, ("k",), "wav", lambda p: p.write_bytes(b"x"), decode)
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_no_cache_dir(self, tmp_path):
+        """cache_dir=None always produces and keeps nothing"""
+        calls = []
+
+        def produce(path):
+            calls.append(path)
+            path.write_bytes(b"audio")
+
+        for _ in range(2):
+            assert get_or_synth(None, ("k",), "wav", produce, Path.read_bytes) == b"audio"
+
+        assert len(calls) == 2
+        assert not any(p.exists() for p in calls)
+
+    def test_stats_count_hits_and_misses(self, tmp_path):
+        """Lookups against a cache_dir are counted; cache_dir=None is not a lookup"""
+        before = dict(_CACHE_STATS)
+        produce = lambda p: p.write_bytes(b"audio")
+
+        for _ in range(3):
+            get_or_synth(tmp_path, ("k",), "wav", produce, Path.read_bytes)
+        get_or_synth(None, ("k",), "wav", produce, Path.read_bytes)
+
+        assert _CACHE_STATS["misses"] - before["misses"] == 1
+        assert _CACHE_STATS["hits"] - before["hits"] == 2
+
+
+class TestPrune:
+    """Test size-capped LRU eviction"""
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Oldest entries go first until the directory fits; a hit counts as a use"""
+        for i, name in enumerate(("a", "b", "c")):
+            cache_path(tmp_path, (name,), "wav").write_bytes(b"x" * 100)
+            os.utime(cache_path(tmp_path, (name,), "wav"), ns=(i * 10**9, i * 10**9))
+
+        # Reading "a" makes it the most recently used
+        get_or_synth(tmp_path, ("a",), "wav", lambda p: None, Path.read_bytes)
+        (tmp_path / "in-flight.wav.1.2.tmp").write_bytes(b"x" * 100)
+
+        assert prune(tmp_path, max_bytes=200) == 1
+        assert not cache_path(tmp_path, ("b",), "wav").exists()
+        assert cache_path(tmp_path, ("a",), "wav").exists()
+        assert cache_path(tmp_path, ("c",), "wav").exists()
+        assert (tmp_path / "in-flight.wav.1.2.tmp").exists()
+
+        assert prune(tmp_path, max_bytes=200) == 0
+        assert prune(tmp_path / "missing") == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
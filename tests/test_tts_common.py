@@ -3,21 +3,29 @@
 Tests for tts_common.py - Text segmentation and audio utilities
 """
 
+import re
+import shutil
+import subprocess
 import sys
-from pathlib import Path
-
-# Add scripts to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
 import pytest
 from pydub import AudioSegment
 from scripts.tts_common import (
     segment_text,
+    iter_segments,
     build_track,
     measure,
+    detect_silence,
     match_volume,
-    apply_style_prefix
+    apply_style_prefix,
+    export_track,
+    dump_metrics,
+    DBFS_FLOOR
 )
+from scripts import tts_common
+
+# Oldest interpreter the README and CI support
+MIN_PYTHON = (3, 10)
 
 
 class TestSegmentation:
@@ -49,8 +57,7 @@ class TestSegmentation:
         # Should split into multiple segments
         assert len(segments) > 1
         # Each segment should be reasonably sized
-        for seg in segments:
-            assert len(seg) <= 100  # Some tolerance for clause splitting
+        assert max(map(len, segments)) <= 100  # Some tolerance for clause splitting
 
     def test_segment_max_chars_boundary(self):
         """Test segmentation near max_chars boundary"""
@@ -70,6 +77,17 @@ class TestSegmentation:
         segments = segment_text("   \n\n   ", max_chars=100)
         assert len(segments) == 0
 
+    def test_iter_segments_matches_segment_text(self, tmp_path):
+        """Streaming segmentation from a file gives the same segments"""
+        text = ("  First paragraph. It has two sentences.\n  \n\n"
+                "Second one,\nwrapped over lines! Short.\n\t\nThird")
+        path = tmp_path / "input.txt"
+        path.write_text(text, encoding="utf-8")
+
+        for max_chars, mode in [(20, "sentence"), (800, "sentence"), (30, "paragraph")]:
+            with open(path, encoding="utf-8") as f:
+                assert list(iter_segments(f, max_chars, mode)) == segment_text(text, max_chars, mode)
+
     def test_segment_paragraph_mode(self):
         """Test paragraph mode keeps whole paragraphs when possible"""
         text = "Short para one.\n\nShort para two."
@@ -78,22 +96,35 @@ class TestSegmentation:
         # Small paragraphs should be kept separate
         assert len(segments) == 2
 
+    def test_segment_sentence_boundaries(self):
+        """Sentences end at terminator (+ closing quote) followed by whitespace only"""
+        text = 'He said "Stop!" Then v1.2 shipped... Done?! e.g.no break\nhere. Tail without end'
+        segments = segment_text(text, max_chars=20)
+
+        assert segments == ['He said "Stop!"', "Then v1.2 shipped...", "Done?!",
+                            "e.g.no break\nhere.", "Tail without end"]
+
+    def test_patterns_compile_on_min_python(self):
+        """Module-level regexes compile on the oldest supported Python (no 3.11-only ++ / (?>...))"""
+        patterns = [v.pattern for v in vars(tts_common).values() if isinstance(v, re.Pattern)]
+        if sys.version_info[:2] == MIN_PYTHON:
+            exe = sys.executable
+        else:
+            exe = shutil.which("python%d.%d" % MIN_PYTHON)
+            # pyenv shims exist on PATH even when that version isn't selected
+            if not exe or subprocess.run([exe, "-c", ""], capture_output=True).returncode != 0:
+                pytest.skip("Python %d.%d not available" % MIN_PYTHON)
+
+        r = subprocess.run(
+            [exe, "-c", "import re, sys\nfor p in sys.argv[1:]: re.compile(p)", *patterns],
+            capture_output=True, text=True
+        )
+        assert r.returncode == 0, r.stderr
+
 
 class TestAudioProcessing:
     """Test audio building and post-processing"""
 
-    @pytest.fixture
-    def fake_audio(self):
-        """Load fake audio fixture"""
-        fixture_path = Path(__file__).parent / "data" / "fake.wav"
-        return AudioSegment.from_wav(str(fixture_path))
-
-    @pytest.fixture
-    def silence_audio(self):
-        """Load silence audio fixture"""
-        fixture_path = Path(__file__).parent / "data" / "silence_500ms.wav"
-        return AudioSegment.from_wav(str(fixture_path))
-
     def test_build_track_single_chunk(self, fake_audio):
         """Test building track with single audio chunk"""
         track = build_track([fake_audio], normalize=False)
@@ -101,9 +132,9 @@ class TestAudioProcessing:
         # Should have similar duration to input
         assert abs(len(track) - len(fake_audio)) < 200  # Within 200ms
 
-    def test_build_track_multiple_chunks(self, fake_audio):
+    def test_build_track_multiple_chunks(self, tiny_audio):
         """Test building track with multiple chunks"""
-        chunks = [fake_audio, fake_audio, fake_audio]
+        chunks = [tiny_audio, tiny_audio, tiny_audio]
 
         track = build_track(
             chunks,
@@ -114,16 +145,48 @@ class TestAudioProcessing:
         )
 
         # Duration should be: 3 chunks + 2 pauses
-        expected_min = (len(fake_audio) * 3) + (500 * 2) - 100  # Some tolerance
+        expected_min = (len(tiny_audio) * 3) + (500 * 2) - 100  # Some tolerance
         assert len(track) >= expected_min
 
-    def test_build_track_with_fades(self, fake_audio):
+    def test_build_track_no_crossfade_exact_length(self, fake_audio):
+        """Buffer assembly: exactly chunks + pauses, with silent gaps"""
+        chunks = [fake_audio, fake_audio, fake_audio]
+
+        track = build_track(chunks, pause_medium=0.5, fade_ms=0, crossfade_ms=0, normalize=False)
+
+        assert track.frame_rate == fake_audio.frame_rate
+        assert abs(len(track) - (len(fake_audio) * 3 + 1000)) <= 1
+        gap_start = len(fake_audio)
+        assert track[gap_start + 50:gap_start + 450].rms == 0
+
+    def test_concat_with_pauses_mixed_formats(self, fake_audio):
+        """Chunks with different rates/channels are synced before assembly"""
+        from scripts.tts_common import concat_with_pauses
+
+        other = fake_audio.set_frame_rate(fake_audio.frame_rate // 2).set_channels(2)
+        track = concat_with_pauses([fake_audio, other], 100)
+
+        assert track.channels == 2
+        assert track.frame_rate == fake_audio.frame_rate
+
+    def test_build_track_with_fades(self, tiny_audio):
         """Test that fades are applied"""
-        track = build_track([fake_audio], fade_ms=50, normalize=False)
+        track = build_track([tiny_audio], fade_ms=50, normalize=False)
 
         # Track should exist and have reasonable duration
         assert len(track) > 0
-        assert abs(len(track) - len(fake_audio)) < 200
+        assert abs(len(track) - len(tiny_audio)) < 200
+
+    def test_fade_chunk_matches_pydub(self, fake_audio):
+        """Vectorized fades give pydub's fade_in().fade_out() samples"""
+        from scripts.tts_common import fade_chunk
+
+        chunk = fake_audio[:437]
+        for fade_ms in (5, 20, 50):
+            expected = chunk.fade_in(fade_ms).fade_out(fade_ms)
+            assert fade_chunk(chunk, fade_ms).raw_data == expected.raw_data
+
+        assert fade_chunk(chunk, 0) is chunk
 
     def test_build_track_with_crossfade(self, fake_audio):
         """Test crossfade between chunks"""
@@ -140,20 +203,49 @@ class TestAudioProcessing:
         total_duration = len(fake_audio) * 2
         assert len(track) < total_duration
 
+    def test_build_track_crossfade_exact_length(self, fake_audio):
+        """Each crossfade overlaps exactly crossfade_ms of neighbouring chunks"""
+        chunks = [fake_audio, fake_audio, fake_audio]
+
+        track = build_track(chunks, fade_ms=0, crossfade_ms=100, normalize=False)
+
+        assert abs(len(track) - (len(fake_audio) * 3 - 200)) <= 1
+
+    def test_crossfade_short_chunks(self, fake_audio):
+        """A track shorter than the crossfade gets a pause; short chunks don't raise"""
+        from scripts.tts_common import concat_with_crossfade
+
+        blip = fake_audio[:30]
+        track = concat_with_crossfade([blip, fake_audio, blip], crossfade_ms=50, pause_ms=200)
+
+        # blip + pause + full chunk, then the last blip overlaps entirely
+        assert abs(len(track) - (30 + 200 + len(fake_audio))) <= 1
+
     def test_build_track_empty_chunks(self):
         """Test building track with no chunks"""
         track = build_track([])
         assert len(track) == 0
 
-    def test_build_track_speed_adjustment(self, fake_audio):
+    def test_build_track_speed_adjustment(self, tiny_audio):
         """Test speed adjustment"""
-        original_track = build_track([fake_audio], speed=1.0, normalize=False)
-        fast_track = build_track([fake_audio], speed=1.05, normalize=False)
+        original_track = build_track([tiny_audio], speed=1.0, normalize=False)
+        fast_track = build_track([tiny_audio], speed=1.05, normalize=False)
 
         # Fast track should be shorter (within 5% tolerance)
         # Speed adjustment may have rounding effects on short audio
         assert len(fast_track) <= len(original_track) * 1.05
 
+    def test_change_speed_duration(self, fake_audio):
+        """speed > 1 shortens by 1/speed, speed < 1 lengthens; frame rate unchanged"""
+        from scripts.tts_common import change_speed
+
+        fast = change_speed(fake_audio, 1.25)
+        slow = change_speed(fake_audio, 0.8)
+
+        assert fast.frame_rate == slow.frame_rate == fake_audio.frame_rate
+        assert abs(len(fast) - len(fake_audio) / 1.25) <= 5
+        assert abs(len(slow) - len(fake_audio) / 0.8) <= 5
+
     def test_build_track_normalization(self, fake_audio):
         """Test normalization"""
         # Create a quiet audio
@@ -166,31 +258,31 @@ class TestAudioProcessing:
         assert track_normalized.dBFS > track_original.dBFS
 
 
-class TestMeasurement:
-    """Test audio measurement functions"""
+@pytest.fixture(scope="module")
+def fake_metrics(fake_audio):
+    """measure(fake_audio), computed once; tests only read it"""
+    return measure(fake_audio)
+
 
-    @pytest.fixture
-    def fake_audio(self):
-        """Load fake audio fixture"""
-        fixture_path = Path(__file__).parent / "data" / "fake.wav"
-        return AudioSegment.from_wav(str(fixture_path))
+@pytest.fixture(scope="module")
+def silence_metrics(silence_audio):
+    """measure(silence_audio), computed once"""
+    return measure(silence_audio)
 
-    @pytest.fixture
-    def silence_audio(self):
-        """Load silence audio fixture"""
-        fixture_path = Path(__file__).parent / "data" / "silence_500ms.wav"
-        return AudioSegment.from_wav(str(fixture_path))
 
-    def test_measure_duration(self, fake_audio):
+class TestMeasurement:
+    """Test audio measurement functions"""
+
+    def test_measure_duration(self, fake_metrics):
         """Test duration measurement"""
-        metrics = measure(fake_audio)
+        metrics = fake_metrics
 
         assert "duration_sec" in metrics
         assert 0.4 < metrics["duration_sec"] < 0.6  # Should be around 0.5s
 
-    def test_measure_levels(self, fake_audio):
+    def test_measure_levels(self, fake_metrics):
         """Test RMS and peak level measurement"""
-        metrics = measure(fake_audio)
+        metrics = fake_metrics
 
         assert "rms_dbfs" in metrics
         assert "peak_dbfs" in metrics
@@ -198,17 +290,51 @@ class TestMeasurement:
         assert -50 < metrics["rms_dbfs"] <= 0
         assert -50 < metrics["peak_dbfs"] <= 0  # Allow 0.0 for max amplitude
 
-    def test_measure_silence_ratio(self, silence_audio):
+    def test_measure_levels_match_pydub(self, fake_audio, silence_audio):
+        """Levels from the numpy pass equal AudioSegment.dBFS / max_dBFS, silence included"""
+        quiet = fake_audio.apply_gain(-27.3).set_channels(2)
+        for audio in (fake_audio, quiet, quiet.set_sample_width(4), silence_audio):
+            metrics = measure(audio)
+            assert metrics["rms_dbfs"] == round(audio.dBFS, 2)
+            assert metrics["peak_dbfs"] == round(audio.max_dBFS, 2)
+
+    def test_dump_metrics_floors_silent_levels(self):
+        """Digital silence measures -inf dBFS; JSON gets DBFS_FLOOR, not null"""
+        import orjson
+
+        metrics = measure(AudioSegment.silent(duration=300))
+        assert metrics["rms_dbfs"] == float("-inf")
+
+        loaded = orjson.loads(dump_metrics({"openai": metrics, "segments": 3}))
+        assert loaded["openai"]["rms_dbfs"] == DBFS_FLOOR
+        assert loaded["openai"]["peak_dbfs"] == DBFS_FLOOR
+        assert loaded["openai"]["silence_ratio"] == metrics["silence_ratio"]
+        assert loaded["segments"] == 3
+
+    def test_dump_metrics_rejects_other_non_finite(self):
+        """Non-finite values outside *_dbfs levels raise instead of becoming null"""
+        with pytest.raises(ValueError, match="duration_ratio"):
+            dump_metrics({"duration_ratio": float("nan")})
+
+    def test_measure_silence_ratio(self, silence_metrics):
         """Test silence ratio measurement"""
-        metrics = measure(silence_audio)
+        metrics = silence_metrics
 
         assert "silence_ratio" in metrics
         # Silence audio should have high silence ratio
         assert metrics["silence_ratio"] > 90  # At least 90% silence
 
-    def test_measure_tone_has_low_silence(self, fake_audio):
+    def test_detect_silence_matches_pydub(self, fake_audio, silence_audio):
+        """Vectorized silence detection returns pydub's ranges"""
+        from pydub.silence import detect_silence as pydub_detect_silence
+
+        audio = fake_audio + silence_audio + fake_audio[:123] + silence_audio[:217] + fake_audio
+        for args in [(100, -40, 10), (50, -40, 7), (300, -30, 1)]:
+            assert detect_silence(audio, *args) == pydub_detect_silence(audio, *args)
+
+    def test_measure_tone_has_low_silence(self, fake_metrics):
         """Test that tone has low silence ratio"""
-        metrics = measure(fake_audio)
+        metrics = fake_metrics
 
         # Tone should have very little silence
         assert metrics["silence_ratio"] < 10  # Less than 10% silence
@@ -217,12 +343,6 @@ class TestMeasurement:
 class TestVolumeMatching:
     """Test volume matching functionality"""
 
-    @pytest.fixture
-    def fake_audio(self):
-        """Load fake audio fixture"""
-        fixture_path = Path(__file__).parent / "data" / "fake.wav"
-        return AudioSegment.from_wav(str(fixture_path))
-
     def test_match_volume_equal_levels(self, fake_audio):
         """Test matching volumes when already equal"""
         audio1 = fake_audio
@@ -245,6 +365,32 @@ class TestVolumeMatching:
         assert matched1.dBFS > audio1.dBFS
 
 
+class TestExport:
+    """Test final track export"""
+
+    def test_export_wav_and_pcm(self, fake_audio, tmp_path):
+        """wav and pcm are written without ffmpeg"""
+        export_track(fake_audio, tmp_path / "out.wav", "wav")
+        export_track(fake_audio, tmp_path / "out.pcm", "pcm")
+
+        assert len(AudioSegment.from_wav(str(tmp_path / "out.wav"))) == len(fake_audio)
+        assert (tmp_path / "out.pcm").read_bytes() == fake_audio.raw_data
+
+    def test_export_compressed_pipes_raw_samples(self, fake_audio, tmp_path, monkeypatch):
+        """Compressed formats feed the samples to a single ffmpeg run on stdin"""
+        from scripts import tts_common
+
+        calls = []
+        monkeypatch.setattr(tts_common.subprocess, "run", lambda cmd, **kw: calls.append((cmd, kw)))
+        export_track(fake_audio, tmp_path / "out.mp3", "mp3")
+
+        (cmd, kw), = calls
+        assert kw["input"] == fake_audio.raw_data
+        assert cmd[cmd.index("-ar") + 1] == str(fake_audio.frame_rate)
+        assert "libmp3lame" in cmd
+        assert cmd[-1] == str(tmp_path / "out.mp3")
+
+
 class TestStylePrefix:
     """Test style prefix functionality"""
 